@@ -6,12 +6,20 @@ import re
 import shutil
 import stat
 import os
-import sys
+import tempfile
+from parallel_pytest import results_by_file, run_pytest_session
+from test_reports import follow_jsonl_reports, plugin_environment
+from venv_pool import get_venv_pool
+from wheelhouse import get_wheelhouse
+
+OUTCOME_SYMBOLS = {"passed": "✅", "failed": "❌", "error": "❗", "skipped": "⏭️", "xfailed": "✅", "xpassed": "❔"}
+DJANGO_TEST_TIMEOUT = int(os.getenv("DJANGO_TEST_TIMEOUT", 1800))
+VENV_SOURCE_MESSAGES = {"pool": "taken from the pre-warmed pool", "cache": "reused from the cache", "build": "built and cached"}
 
 # Function to install a Python package
-def install_package(package_name):
+def install_package(package_name, python="python"):
     try:
-        os.system(f"pip install {package_name}")
+        get_wheelhouse().install([package_name], python)
         print(f"Successfully installed {package_name}!")
         st.info(f"Successfully installed {package_name}!")
 
@@ -27,7 +35,7 @@ def clone_repo(repo_url):
         st.info(f"Successfully cloned repository: {repo_url}")
     except Exception as e:
         print(f"Failed to clone repository: {e}")
-        sys.exit(1)
+        raise Exception(f"Failed to clone repository: {e}")
 
 def navigate_into_repo_folder(repo_name):
     """Navigate into the repository folder."""
@@ -37,59 +45,47 @@ def navigate_into_repo_folder(repo_name):
         st.info(f"Navigated into repository folder: {repo_name}")
     except FileNotFoundError:
         print(f"Repository folder not found: {repo_name}")
-        sys.exit(1)
-
-def create_virtual_environment():
-    """Create a virtual environment."""
+        raise Exception(f"Repository folder not found: {repo_name}")
+
+def create_virtual_environment(packages=()):
+    """
+    Create ./venv with requirements.txt and `packages` installed, taken from
+    the pre-warmed pool or the venv cache, and return the path of its
+    interpreter. Commands run with that interpreter use the venv, nothing
+    needs to be activated.
+    """
     try:
-        os.system("python -m venv venv")
-        print("Virtual environment created successfully.")
-        st.info("Virtual environment created successfully.")
+        python, source = get_venv_pool().checkout("venv", ".", packages)
+        message = f"Virtual environment {VENV_SOURCE_MESSAGES[source]}."
+        print(message)
+        st.info(message)
+        return python
     except Exception as e:
         print(f"Failed to create virtual environment: {e}")
-        sys.exit(1)
-
-def activate_virtual_environment():
-    """Activate the virtual environment."""
-    try:
-        # Determine the activation script path based on the operating system
-        if os.name == "nt":  # Windows
-            activate_script = os.path.join("venv", "Scripts", "activate.bat")
-            command = f"call {activate_script}"  # Use 'call' to execute the batch file
-        else:  # macOS and Linux
-            activate_script = os.path.join("venv", "bin", "activate")
-            command = f"source {activate_script}"  # Use 'source' to execute the shell script
-
-        # Run the activation command in the shell
-        os.system(command)
-        print("Virtual environment activated successfully.")
-        st.info("Virtual environment activated successfully.")
-    except Exception as e:
-        print(f"Failed to activate virtual environment: {e}")
-        sys.exit(1)
+        raise Exception(f"Failed to create virtual environment: {e}")
 
-def install_requirements():
+def install_requirements(python="python"):
     """Install requirements from requirements.txt if it exists."""
     if os.path.exists("requirements.txt"):
         try:
-            os.system("pip install -r requirements.txt")
+            get_wheelhouse().install(["-r", "requirements.txt"], python)
             print("Requirements installed successfully.")
             st.info("Requirements installed successfully.")
         except Exception as e:
             print(f"Failed to install requirements: {e}")
-            sys.exit(1)
+            raise Exception(f"Failed to install requirements: {e}")
     else:
         print("requirements.txt not found. Skipping requirements installation.")
 
-def install_testing_library():
+def install_testing_library(python="python"):
     """Install the testing library (pytest)."""
     try:
-        os.system("pip install pytest")
+        get_wheelhouse().install(["pytest"], python)
         print("pytest installed successfully.")
         st.info("pytest installed successfully.")
     except Exception as e:
         print(f"Failed to install pytest: {e}")
-        sys.exit(1)
+        raise Exception(f"Failed to install pytest: {e}")
 
 def create_tests_folder():
     """Create a tests folder for unit tests."""
@@ -120,26 +116,35 @@ python_functions = test_* check_*
 
 
 
-def run_django_tests_and_capture_results():
+def run_django_tests_and_capture_results(python="python", on_result=None):
+    """
+    Run `manage.py test tests` with the JSON-lines runner and return
+    {test id: {"outcome", "duration", "message"}}, calling
+    `on_result(test_id, result)` as each test finishes.
+    """
     try:
-        # Run `python manage.py test` and redirect output to a file
-        command = "python manage.py test tests --verbosity=2 > test_output.txt 2>&1"
-        print(f"Running command: {command}")
-
-        # Execute the command and capture output in the test_output.txt file
-        os.system(command)
+        with tempfile.TemporaryDirectory(prefix="django-tests-") as report_dir:
+            report = os.path.join(report_dir, "results.jsonl")
+            command = [python, "manage.py", "test", "tests", "--verbosity=2", "--testrunner=django_jsonl_runner.JSONLinesTestRunner"]
+            print(f"Running command: {' '.join(command)}")
+
+            with open(os.path.join(report_dir, "output.log"), "w+") as log:
+                process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=plugin_environment(DJANGO_JSONL_REPORT=report))
+                test_results = {}
+                for record in follow_jsonl_reports([report], [process], DJANGO_TEST_TIMEOUT):
+                    result = {"outcome": record["outcome"], "duration": record["duration"], "message": record["message"]}
+                    test_results[record["nodeid"]] = result
+                    if on_result:
+                        on_result(record["nodeid"], result)
+
+                # Debug: Print raw test output
+                log.seek(0)
+                print("Raw Django test output:")
+                print("====================================================")
+                print(log.read())
+                print("====================================================")
 
-        # Now, read the contents of the file to get the test results
-        with open('test_output.txt', 'r') as file:
-            test_output = file.read()
-
-        # Debug: Print raw test output
-        print("Raw Django test output:")
-        print("====================================================")
-        print(test_output)
-        print("====================================================")
-
-        return test_output
+        return test_results
 
     except Exception as e:
         print(f"Error running Django tests: {e}")
@@ -149,40 +154,8 @@ def run_pytest_and_capture_results(file_path):
     try:
         # Construct the full path to the test file
         full_path = os.path.join("tests", file_path)
-        
-        # Run pytest with the --collect-only flag to list all test methods
-        collect_output = os.popen(f"pytest {full_path} --collect-only").read()
-        
-        # Check if the command was successful
-        if "ERROR" in collect_output or "FAILED" in collect_output:
-            print("Error collecting test methods.")
-            return {}
-
-        # Extract test method names from the output
-        test_methods = re.findall(r"<Function\s+(test_\w+)>", collect_output)
-
-        # Run pytest and capture the results
-        pytest_output = os.popen(f"pytest {full_path} -v").read()
-
-        # Debug: Print raw pytest output
-        print("Raw pytest output:")
-        print(pytest_output)
-
-        # Parse the results to determine which tests passed or failed
-        test_results = {}
-        for line in pytest_output.splitlines():
-            if "PASSED" in line or "FAILED" in line or "ERROR" in line:
-                # Match the test name more precisely
-                match = re.search(r"(\w+::test_\w+)", line)
-                if match:
-                    test_name = match.group(1).replace('::', '')
-                    if test_name not in test_results:  # Ensure each test is only added once
-                        if "PASSED" in line:
-                            test_results[test_name] = "✅"
-                        elif "FAILED" in line or "ERROR" in line:
-                            test_results[test_name] = "❌"
-
-        return test_results
+        results = run_pytest_session([full_path])
+        return {test_name: OUTCOME_SYMBOLS.get(result["outcome"], "❔") for test_name, result in results_by_file(results).get(os.path.normpath(full_path), {}).items()}
 
     except Exception as e:
         print(f"Error running pytest: {e}")
@@ -202,7 +175,7 @@ def run_tests():
     # Check the return code
     if return_code != 0:
         print("Tests failed.")
-        sys.exit(1)
+        raise Exception("Tests failed.")
     else:
         print("All tests passed!")
 
@@ -275,7 +248,7 @@ def install_jest():
     except Exception as e:
         print(f"Failed to install Jest: {e}")
         print("Ensure Node.js and npm are installed and added to the system PATH.")
-        exit(1)
+        raise Exception(f"Failed to install Jest: {e}")
 
 # Function to run Jest and capture results (JavaScript-specific)
 def run_jest_and_capture_results():
@@ -361,10 +334,18 @@ def navigate_to_root_folder(root_folder_path):
         print(f"Navigated to root folder: {root_folder_path}")
     except FileNotFoundError:
         print(f"Root folder not found: {root_folder_path}")
-        sys.exit(1)
+        raise Exception(f"Root folder not found: {root_folder_path}")
     except PermissionError:
         print(f"Permission denied while accessing: {root_folder_path}")
-        sys.exit(1)
+        raise Exception(f"Permission denied while accessing: {root_folder_path}")
+
+
+def show_test_result(test_id, result):
+    formatted_result = f"{OUTCOME_SYMBOLS.get(result['outcome'], '❔')} {test_id} → {result['outcome']} ({result['duration']:.2f}s)"
+    print(formatted_result)
+    st.write(formatted_result)
+    if result["message"] and result["outcome"] in ("failed", "error"):
+        st.write(result["message"])
 
 
 def extract_test_results(output):
@@ -397,37 +378,14 @@ def run_test(repo_url, repo_name, json_input, language,framework):
                 print("i am in django ....")
                 print(f"project_root_path:{project_root_path}")
                 navigate_to_root_folder(project_root_path)
-                create_virtual_environment()
-                activate_virtual_environment()
-                install_requirements()
+                python = create_virtual_environment()
                 create_test_files_for_functions_django(data)
-                test_results = run_django_tests_and_capture_results()
+                test_results = run_django_tests_and_capture_results(python, on_result=show_test_result)
                     
                 if test_results:
                     print(f"test_results in django: {test_results}")
-
-                    # Extract number of tests found
-                    match_summary = re.search(r"Found (\d+) test\(s\)", test_results)
-                    num_tests = int(match_summary.group(1)) if match_summary else 0
-                    print(f"Found: {num_tests} tests")
-                    st.write(f"Found: {num_tests} tests")
-                    test_cases = re.findall(r"(test_[^\s]+) \(([^)]+)\) \.\.\. (\w+)", test_results)
-                     # Loop through the extracted test cases and display formatted results
-                    for test_name, test_location, test_status in test_cases:
-                        # Define the status symbols
-                        if test_status == "ok":
-                            status_symbol = "✅"  # Success
-                        elif test_status == "FAIL":
-                            status_symbol = "❌"  # Failure
-                        elif test_status == "ERROR":
-                            status_symbol = "❗"  # Error
-                        else:
-                            status_symbol = "❔"  # Unknown
-
-                        # Format the result to show the symbol and test information
-                        formatted_result = f"{test_name} → {test_status} {status_symbol} )"
-                        print(formatted_result)
-                        st.write(formatted_result)
+                    print(f"Found: {len(test_results)} tests")
+                    st.write(f"Found: {len(test_results)} tests")
                 else:
                     print("No test results found.")
                     st.write("No test results found.")
@@ -438,27 +396,22 @@ def run_test(repo_url, repo_name, json_input, language,framework):
             else:
                 print(f"Python in list: {language}")
                 navigate_into_repo_folder(repo_name=repo_name)
-                create_virtual_environment()
-                activate_virtual_environment()
-                install_package("pytest")
-                install_requirements()
+                python = create_virtual_environment(packages=("pytest",))
                 create_pytest_ini()
                 create_test_files_for_functions(data)
 
-                # Run tests and display results
+                # Every generated file runs in one pytest session spread over the CPU cores
+                test_files = {}
                 for item in data:
                     tested_function = extract_tested_function(item["unit_test_code"])
-                    
                     if tested_function:
-                        test_file_name = f"test_{tested_function}.py"
-                        test_results = run_pytest_and_capture_results(test_file_name)
-                        print(f"test_results:{test_results}")
-                        st.write(f"Test Results for {tested_function}:")
-                        
-                        for test_name, result in test_results.items():
-                            st.write(f"{result} {test_name}")
+                        test_files[tested_function] = os.path.join("tests", f"test_{tested_function}.py")
                     else:
                         st.warning(f"Could not determine the function being tested in: {item['unit_test_id']}")
+
+                # Results are shown as each test finishes
+                st.write("Test Results:")
+                run_pytest_session(sorted(set(test_files.values())), python=python, on_result=show_test_result)
         
         elif 'JavaScript' in language or 'javascript' in language:
             print(f"JavaScript in list: {language}")
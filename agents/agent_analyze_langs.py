@@ -1,8 +1,9 @@
 import streamlit as st
-import asyncio
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
-from utils import count_tokens, split_into_chunks, split_large_chunk
+from utils import gather_chunks, iter_chunks
+from llm_cache import cached_ainvoke
+from techstack_detector import detect_techstack, STATIC_DETECTION_MIN_CONFIDENCE
 from dotenv import load_dotenv
 import os
 
@@ -14,94 +15,105 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MAX_CHUNK_SIZE = 100000  # Define a safe chunk size to avoid token overflow
 MAX_TOKENS = 16000  # Safe limit for gpt-3.5-turbo
 RESERVED_PROMPT_TOKENS = 1000  # Reserve tokens for the prompt
+MODEL_NAME = "gpt-3.5-turbo"
+MAX_CONCURRENT_REQUESTS = int(os.getenv("LANGS_MAX_CONCURRENCY", 8))  # In-flight chunk requests
 
 
 import json
 
-async def analyze_repo_content(content: str):
+
+def build_langs_prompt(sub_chunk: str):
+    """
+    Build the language/framework detection prompt for one chunk.
+    """
+    prompt_template = f"""
+    Given the content of code: {sub_chunk.strip()} of this project, analyze the code to identify the major programming languages and frameworks used in this project. Follow these steps to make your analysis:
+
+    1. **File Extensions**: Look at the file extensions in the project. Common extensions include:
+       - `.py` for Python
+       - `.js` for JavaScript
+       - `.java` for Java
+       - `.rb` for Ruby
+       - `.php` for PHP
+       - `.html`, `.css`, `.scss` for web technologies
+       - `.ts` for TypeScript
+       - `.cpp`, `.h` for C++
+       - `.cs` for C#
+
+    2. **Configuration Files**: Check for configuration files that specify dependencies or frameworks. Common files include:
+       - `package.json` for Node.js projects (JavaScript frameworks like React, Angular, or Vue.js).
+       - `requirements.txt` or `Pipfile` for Python projects (frameworks like Django, Flask).
+       - `Gemfile` for Ruby projects (frameworks like Rails).
+       - `pom.xml` or `build.gradle` for Java projects (frameworks like Spring).
+       - `composer.json` for PHP projects (frameworks like Laravel, Symfony).
+       - `Dockerfile` or `docker-compose.yml` which might provide hints about the technology stack.
+
+    3. **Framework-Specific Files**: Some frameworks have specific files or directories:
+       - `app/` and `config/` for Ruby on Rails projects.
+       - `src/` and `public/` for React, Angular, or similar frameworks.
+       - `manage.py` or `app.py` for Django or Flask.
+
+    4. **Documentation and Comments**: Sometimes, documentation files like `README.md` or inline comments in the code indicate the frameworks and languages used. Look for any mention of the tech stack in these files.
+
+    Your task is to identify the **programming languages** (such as Python, JavaScript, Ruby, etc.) and **frameworks** (such as Django, React, Angular, Rails, etc.) used in the project. Provide a list of the major languages and frameworks found in the repository.
+    Be sure to mention the specific language and framework for each section based on the observations from the code and configuration files.
+    Do not consider any irrelevant files or directories that do not contribute to the tech stack.
+    Do not add MIT License, README.md, or any other irrelevant files in the analysis.
+    Make sure to not add any explanation or comments, only the list of languages and frameworks.
+   5. Return the result as a single dictionary with the following format:
+                   {{
+                        "languages": ["language_name", ...],
+                        "frameworks": ["framework_name", ...]
+                    }}
+                    Ensure no duplicates in the lists and avoid any explanations or comments.
+    """
+    return prompt_template
+
+
+async def analyze_repo_content(content: str, tree: str = None, max_concurrency: int = None, errors: list = None):
+    """
+    Detect the languages and frameworks of a gitingest dump.
+
+    The static detector runs first and its result is returned as-is when its
+    confidence is high enough. Otherwise chunks are dispatched concurrently through one shared client, at most
+    `max_concurrency` at a time, and merged into the result as they complete.
+    Failed chunks are recorded in `errors` (when a list is passed) as dicts with
+    the chunk index, error type and message.
+    """
     # Split content based on the "File: /path/to/file" pattern to avoid token overflow
     safe_token_limit = MAX_TOKENS - RESERVED_PROMPT_TOKENS
-    chunks = split_into_chunks(content, safe_token_limit)
-    results = []
-
-    # Initialize sets to collect languages and frameworks
-    all_languages = set()
-    all_frameworks = set()
-
-    for chunk in chunks:
-        # If chunk is still too large, split further based on token count
-        if count_tokens(chunk) > safe_token_limit:
-            smaller_chunks = split_large_chunk(chunk, safe_token_limit)
-        else:
-            smaller_chunks = [chunk]
-
-        for sub_chunk in smaller_chunks:
-            if sub_chunk.strip():  # Skip empty chunks
-                prompt_template = f"""
-                Given the content of code: {sub_chunk.strip()} of this project, analyze the code to identify the major programming languages and frameworks used in this project. Follow these steps to make your analysis:
-
-                1. **File Extensions**: Look at the file extensions in the project. Common extensions include:
-                   - `.py` for Python
-                   - `.js` for JavaScript
-                   - `.java` for Java
-                   - `.rb` for Ruby
-                   - `.php` for PHP
-                   - `.html`, `.css`, `.scss` for web technologies
-                   - `.ts` for TypeScript
-                   - `.cpp`, `.h` for C++
-                   - `.cs` for C#
-
-                2. **Configuration Files**: Check for configuration files that specify dependencies or frameworks. Common files include:
-                   - `package.json` for Node.js projects (JavaScript frameworks like React, Angular, or Vue.js).
-                   - `requirements.txt` or `Pipfile` for Python projects (frameworks like Django, Flask).
-                   - `Gemfile` for Ruby projects (frameworks like Rails).
-                   - `pom.xml` or `build.gradle` for Java projects (frameworks like Spring).
-                   - `composer.json` for PHP projects (frameworks like Laravel, Symfony).
-                   - `Dockerfile` or `docker-compose.yml` which might provide hints about the technology stack.
-
-                3. **Framework-Specific Files**: Some frameworks have specific files or directories:
-                   - `app/` and `config/` for Ruby on Rails projects.
-                   - `src/` and `public/` for React, Angular, or similar frameworks.
-                   - `manage.py` or `app.py` for Django or Flask.
-
-                4. **Documentation and Comments**: Sometimes, documentation files like `README.md` or inline comments in the code indicate the frameworks and languages used. Look for any mention of the tech stack in these files.
-
-                Your task is to identify the **programming languages** (such as Python, JavaScript, Ruby, etc.) and **frameworks** (such as Django, React, Angular, Rails, etc.) used in the project. Provide a list of the major languages and frameworks found in the repository.
-                Be sure to mention the specific language and framework for each section based on the observations from the code and configuration files.
-                Do not consider any irrelevant files or directories that do not contribute to the tech stack.
-                Do not add MIT License, README.md, or any other irrelevant files in the analysis.
-                Make sure to not add any explanation or comments, only the list of languages and frameworks.
-               5. Return the result as a single dictionary with the following format:
-                               {{
-                                    "languages": ["language_name", ...],
-                                    "frameworks": ["framework_name", ...]
-                                }}
-                                Ensure no duplicates in the lists and avoid any explanations or comments.
-                """
-                message = HumanMessage(content=prompt_template)
-
-                try:
-                    # Initialize OpenAI API client with error handling
-                    ai = ChatOpenAI(model="gpt-3.5-turbo", api_key=OPENAI_API_KEY, temperature=0)
-                    ai_response = await ai.ainvoke([message])
-                    result = ai_response.content.strip()
-
-                    # Parse the JSON response into a dictionary
-                    parsed_result = json.loads(result)
-                    print(f"parsed_result inside language agent: {parsed_result}")
-                    
-                    # Update the sets with the languages and frameworks
-                    if "languages" in parsed_result:
-                        all_languages.update(parsed_result["languages"])
-                    if "frameworks" in parsed_result:
-                        all_frameworks.update(parsed_result["frameworks"])
-
-                except Exception as e:
-                    print(f"Error during OpenAI API call language: {str(e)}")
-                    results.append(f"Error processing this sub-chunk: {str(e)}")
+    if errors is None:
+        errors = []
+
+    static_result, confidence = detect_techstack(content, tree)
+    print(f"static techstack detection: {static_result} (confidence {confidence})")
+    if confidence >= STATIC_DETECTION_MIN_CONFIDENCE:
+        return static_result
+
+    # Initialize sets to collect languages and frameworks, seeded with what was detected locally
+    all_languages = set(static_result["languages"])
+    all_frameworks = set(static_result["frameworks"])
+
+    # One client for every chunk, it pools its HTTP connections
+    ai = ChatOpenAI(model=MODEL_NAME, api_key=OPENAI_API_KEY, temperature=0)
+
+    async def analyze_chunk(index, sub_chunk):
+        message = HumanMessage(content=build_langs_prompt(sub_chunk))
+        # Parse the JSON response into a dictionary, a reply that does not parse is not cached
+        parsed_result = await cached_ainvoke(ai, [message], validate=lambda content: json.loads(content.strip()))
+        print(f"parsed_result inside language agent: {parsed_result}")
+
+        # Update the sets with the languages and frameworks
+        if "languages" in parsed_result:
+            all_languages.update(parsed_result["languages"])
+        if "frameworks" in parsed_result:
+            all_frameworks.update(parsed_result["frameworks"])
+
+    chunks = iter_chunks(content, safe_token_limit, MODEL_NAME)
+    await gather_chunks(chunks, analyze_chunk, max_concurrency or MAX_CONCURRENT_REQUESTS, errors, "language")
 
     # Return the merged results as a dictionary
     return {
-        "languages": list(all_languages),
-        "frameworks": list(all_frameworks)
+        "languages": sorted(all_languages),
+        "frameworks": sorted(all_frameworks)
     }
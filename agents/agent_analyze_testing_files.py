@@ -6,128 +6,146 @@ from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from models.module_method_model import CodeSnippetList
-from utils import count_tokens, split_into_chunks, split_large_chunk
+from utils import gather_chunks, iter_chunks, iter_file_sections, FILE_HEADER_PATTERN
+from llm_cache import cached_parse
+from techstack_detector import EXTENSION_LANGUAGES
+from python_snippet_extractor import extract_python_files
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from openai import OpenAI
+from openai_clients import get_async_openai_client
 import os
 
-
 load_dotenv()
 
-
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MAX_CHUNK_SIZE = 100000  # Define a safe chunk size to avoid token overflow
 MAX_TOKENS = 16000  # Safe limit for gpt-3.5-turbo
 RESERVED_PROMPT_TOKENS = 1000  # Reserve tokens for the prompt
-client = OpenAI()
-
-# Function to analyze repository content and identify languages/frameworks
-
-import json
-import uuid
-import streamlit as st
-import asyncio
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from models.module_method_model import CodeSnippetList
-from utils import count_tokens, split_into_chunks, split_large_chunk
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from openai import OpenAI
-import os
-
-load_dotenv()
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-MAX_CHUNK_SIZE = 100000  # Define a safe chunk size to avoid token overflow
-MAX_TOKENS = 16000  # Safe limit for gpt-3.5-turbo
-RESERVED_PROMPT_TOKENS = 1000  # Reserve tokens for the prompt
-client = OpenAI()
-
-async def analyze_repo_content_need_testing(content: str,tree=None):
+MODEL_NAME = "gpt-4o-mini-2024-07-18"
+MAX_CONCURRENT_REQUESTS = int(os.getenv("TESTING_FILES_MAX_CONCURRENCY", 8))  # In-flight chunk requests
+
+
+def build_need_testing_prompt(sub_chunk: str):
+    """
+    Build the snippet discovery prompt for one chunk.
+    """
+    prompt_template = [
+        {"role": "system", "content": "You are a professional software engineer."},
+        {"role": "user", "content": f"""
+        Given this content of code: {sub_chunk.strip()} of this project, analyze the code to identify functions or classes that require testing.
+
+        Requirements:
+        - Identify only user-defined functions or classes explicitly defined in the provided code.
+        - Exclude any built-in functions, classes, or methods specific to Python, as well as any standard library elements or framework-provided constructs.
+        - List the identified functions or classes in a structured format.
+        - For each identified function or class:
+        - Provide a unique ID in the format "id": "<UUID>".
+        - Include the full path of the function or class in the code.
+        - Provide the name and type (e.g., "function" or "class").
+        - Include the complete code snippet defining the function or class.
+        - Library Used in test
+        - Purpose of this Unit test
+        - Do not return any explanation or comments along with the list.
+        
+
+        Return the result in the following JSON format:
+        {{
+            "snippets": [
+                {{
+                    "id": "<UUID>",
+                    "path": "path for function_or_class",
+                    "name": "function_or_class",
+                    "type": "type_code",
+                    "code": "full_code_snippet"
+                }},
+                ...
+            ]
+        }}
+        """}
+    ]
+    return prompt_template
+
+
+def partition_sections(content: str):
+    """
+    Split the gitingest content into Python files, which are parsed locally, and
+    the source files of other languages, which still go to the LLM.
+
+    Returns (python_files, llm_content) where python_files is a list of
+    (path, source) pairs. Content without "File:" headers goes to the LLM as-is.
+    """
+    python_files = []
+    llm_sections = []
+    has_headers = False
+    for section in iter_file_sections(content):
+        match = FILE_HEADER_PATTERN.match(section)
+        if not match:
+            llm_sections.append(section)
+            continue
+        has_headers = True
+        path = match.group(1).strip()
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".py":
+            python_files.append((path, section[match.end():]))
+        elif extension in EXTENSION_LANGUAGES:
+            llm_sections.append(section)
+
+    if not has_headers:
+        return [], content
+    # With headers, whatever precedes the first file is not code
+    return python_files, "".join(section for section in llm_sections if FILE_HEADER_PATTERN.match(section))
+
+
+async def analyze_repo_content_need_testing(content: str, tree=None, max_concurrency: int = None, errors: list = None):
+    """
+    List the user-defined functions and classes of every chunk of a gitingest dump.
+
+    Python files are parsed with the ast module in a process pool, only the
+    files of other languages (and Python files that fail to parse) are sent to
+    the LLM. Chunks are sent concurrently through the async client, at most
+    `max_concurrency` at a time. Snippets from all chunks are merged in chunk
+    order and deduplicated by (path, name). Failed chunks are recorded in
+    `errors` (when a list is passed) as dicts with the chunk index, error type
+    and message.
+
+    Returns:
+    - JSON string with the list of snippets.
+    """
     safe_token_limit = MAX_TOKENS - RESERVED_PROMPT_TOKENS
-    chunks = split_into_chunks(content, safe_token_limit)
-    results = []
-
-    for chunk in chunks:
-        if count_tokens(chunk) > safe_token_limit:
-            smaller_chunks = split_large_chunk(chunk, safe_token_limit)
-        else:
-            smaller_chunks = [chunk]
-
-        for sub_chunk in smaller_chunks:
-            if sub_chunk.strip():
-                prompt_template = [
-                    {"role": "system", "content": "You are a professional software engineer."},
-                    {"role": "user", "content": f"""
-                    Given this content of code: {sub_chunk.strip()} of this project, analyze the code to identify functions or classes that require testing.
-
-                    Requirements:
-                    - Identify only user-defined functions or classes explicitly defined in the provided code.
-                    - Exclude any built-in functions, classes, or methods specific to Python, as well as any standard library elements or framework-provided constructs.
-                    - List the identified functions or classes in a structured format.
-                    - For each identified function or class:
-                    - Provide a unique ID in the format "id": "<UUID>".
-                    - Include the full path of the function or class in the code.
-                    - Provide the name and type (e.g., "function" or "class").
-                    - Include the complete code snippet defining the function or class.
-                    - Library Used in test
-                    - Purpose of this Unit test
-                    - Do not return any explanation or comments along with the list.
-                    
-
-                    Return the result in the following JSON format:
-                    {{
-                        "snippets": [
-                            {{
-                                "id": "<UUID>",
-                                "path": "path for function_or_class",
-                                "name": "function_or_class",
-                                "type": "type_code",
-                                "code": "full_code_snippet"
-                            }},
-                            ...
-                        ]
-                    }}
-                    """}
-                ]
-
-                try:
-                   
-
-                    ai=client.beta.chat.completions.parse( model="gpt-4o-mini-2024-07-18",messages=prompt_template, response_format=CodeSnippetList)
-                    parsed_results = ai.choices[0].message.parsed
-
-                    print("==============================================================================================")
-                    print(f"parsed_results using parser: {parsed_results}")
-
-                    # for snippet in parsed_results.snippets:
-                    #     snippet.id = uuid.uuid4()
-
-                    # Append the parsed results to the final results list
-                    # results = parsed_results.snippets
-                    parsed_results = [
-                                {
-                                    "id":str(uuid.uuid4()),
-                                    "path": snippet.path,
-                                    "name": snippet.name,
-                                    "type": snippet.type,
-                                    "code": snippet.code
-                                }
-                                for snippet in parsed_results.snippets
-                            ]
-                    json_output = json.dumps(parsed_results, indent=4)
-                    print(f"json_output:{json_output}")
-                    return json_output
-
-       
-
-
-                except Exception as e:
-                    print(f"Error during OpenAI API call files: {str(e)}")
-                    results.append(f"Error processing this sub-chunk: {str(e)}")
-    
-    # flat_results = [item for sublist in results for item in sublist if isinstance(sublist, list)]
-    # return flat_results
\ No newline at end of file
+    if errors is None:
+        errors = []
+
+    python_files, llm_content = partition_sections(content)
+    python_snippets, failed = await asyncio.to_thread(extract_python_files, python_files)
+    print(f"Extracted {len(python_snippets)} snippets from {len(python_files)} Python files locally")
+    for path, source in python_files:
+        if path in failed:
+            llm_content += f"\n{'=' * 64}\nFile: {path}\n{'=' * 64}\n{source}"
+
+    async def analyze_chunk(index, sub_chunk):
+        parsed_results = await cached_parse(get_async_openai_client(), model=MODEL_NAME, messages=build_need_testing_prompt(sub_chunk), response_format=CodeSnippetList)
+
+        print("==============================================================================================")
+        print(f"parsed_results using parser: {parsed_results}")
+        return parsed_results.snippets
+
+    chunks = iter_chunks(llm_content, safe_token_limit, MODEL_NAME)
+    chunk_results = await gather_chunks(chunks, analyze_chunk, max_concurrency or MAX_CONCURRENT_REQUESTS, errors, "files")
+
+    # Merge in chunk order so the inventory does not depend on completion order
+    snippets = {}
+    ordered_snippets = python_snippets + [snippet for index in sorted(chunk_results) for snippet in chunk_results[index]]
+    for snippet in ordered_snippets:
+        key = (snippet.path, snippet.name)
+        if key not in snippets:
+            snippets[key] = {
+                "id": str(uuid.uuid4()),
+                "path": snippet.path,
+                "name": snippet.name,
+                "type": snippet.type,
+                "code": snippet.code
+            }
+
+    json_output = json.dumps(list(snippets.values()), indent=4)
+    print(f"json_output:{json_output}")
+    return json_output
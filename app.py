@@ -5,10 +5,7 @@ from gitingest import ingest
 from dotenv import load_dotenv
 import os
 from add_test_interperator import run_test
-from agents.agent_analyze_langs import analyze_repo_content
-from agents.agent_analyze_testing_files import analyze_repo_content_need_testing
-from agents.agent_generate_test_cases import generate_test_cases
-from agents.agent_generate_test_code import generate_unit_testing_code
+from pipeline import run_pipeline
 import pdfplumber
 from github_app_auth import generate_jwt, get_installation_access_token
 from utils import get_repo_name
@@ -150,26 +147,15 @@ if st.button("Analyze Repository"):
             summary, tree, content = ingest(repo_url)  # Ensure repo_url is defined here
             print(f"summary: {summary}")
 
-            # Perform analysis on the content
-            analysis_result_langs = asyncio.run(analyze_repo_content(content))
-            analysis_result_testing = asyncio.run(analyze_repo_content_need_testing(content))
-            print('==============================================================================================')
-            print(f"analysis_result_langs before json: {analysis_result_langs}")
-            print('==============================================================================================')
-            print('==============================================================================================')
-            
-            # modules_need_testing_json=json.dumps(analysis_result_testing, indent=4)
-            print('==============================================================================================')
-            print(f"modules_need_testing: {analysis_result_testing}")
-            print('==============================================================================================')
-            analysis_result_langs_json=json.dumps(analysis_result_langs, indent=4)
-            print(f"analysis_result_langs: {analysis_result_langs_json}")
-            print('==============================================================================================')
-
-
-            test_cases= asyncio.run(generate_test_cases(analysis_result_testing,analysis_result_langs_json,extracted_text,False))
-            # test_cases_json=json.dumps(test_cases, indent=4)
-            test_code=asyncio.run(generate_unit_testing_code(test_cases,analysis_result_langs_json,False))
+            # Perform analysis on the content, every stage in one event loop
+            pipeline_results = asyncio.run(run_pipeline(content, tree, extracted_text, False))
+            analysis_result_langs = pipeline_results["frameworks_and_languages"]
+            analysis_result_testing = pipeline_results["modules_need_testing"]
+            test_cases = pipeline_results["test_cases"]
+            test_code = pipeline_results["unit_tests"]
+            failed_chunks = sum(len(stage_errors) for stage_errors in pipeline_results["errors"].values())
+            if failed_chunks:
+                st.warning(f"{failed_chunks} chunk(s) could not be analysed, the results may be incomplete: {pipeline_results['errors']}")
             # Create a dictionary with the results
             result_data = {
                 "repo_url": repo_url,
@@ -0,0 +1,184 @@
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+from collections import Counter
+from utils import CACHE_DIR
+from agents.agent_generate_test_cases import generate_test_cases
+from agents.agent_generate_test_code import generate_unit_testing_code
+
+ARTIFACT_STORE_PATH = os.path.abspath(os.getenv("ARTIFACT_STORE_PATH", os.path.join(CACHE_DIR, "artifacts.sqlite3")))
+MAX_CONCURRENT_FUNCTIONS = int(os.getenv("ARTIFACT_MAX_CONCURRENCY", 8))  # Functions generated at once
+
+_artifact_store = None
+_artifact_store_lock = threading.Lock()
+
+
+def normalize_source(code: str):
+    """
+    Normalize function source so formatting and comment changes do not count as edits.
+    Python is compared by its AST, anything else by its non-blank, stripped lines.
+    """
+    dedented = textwrap.dedent(code)
+    try:
+        return ast.dump(ast.parse(dedented), include_attributes=False)
+    except (SyntaxError, ValueError):
+        return "\n".join(line.rstrip() for line in dedented.splitlines() if line.strip())
+
+
+def source_hash(code: str):
+    return hashlib.sha256(normalize_source(code).encode("utf-8")).hexdigest()
+
+
+def artifact_key(module):
+    """
+    Store key of a function: its normalized source plus where it lives. The
+    generated tests import it from its path, so a moved or renamed function,
+    or the same code in two files, needs tests of its own.
+    """
+    location = json.dumps([module.get("path", ""), module.get("name", "")])
+    return hashlib.sha256(f"{location}\0{source_hash(module.get('code', ''))}".encode("utf-8")).hexdigest()
+
+
+def normalize_languages(languages_json):
+    """
+    Sorted, lower-cased languages and frameworks, the detection returns them
+    in no particular order.
+    """
+    try:
+        languages = json.loads(languages_json) if isinstance(languages_json, str) else languages_json
+    except json.JSONDecodeError:
+        return languages_json
+    if not isinstance(languages, dict):
+        return languages_json
+    return {
+        field: sorted({str(value).strip().lower() for value in languages.get(field) or []})
+        for field in ("languages", "frameworks")
+    }
+
+
+def context_hash(languages_json: str, extracted_text: str, is_regression: bool, user_repo=None):
+    """
+    Hash of the inputs besides the function source that shape the generated tests.
+    """
+    payload = json.dumps([normalize_languages(languages_json), extracted_text or "", is_regression, user_repo], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Per-function store of the snippet, its test cases and its unit tests, keyed by
+    artifact_key (path, name and normalized source) and the generation context.
+    """
+
+    def __init__(self, path=ARTIFACT_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                source_hash TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                snippet TEXT NOT NULL,
+                test_cases TEXT NOT NULL,
+                unit_tests TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source_hash, context_hash)
+            )
+        """)
+
+    def get(self, source_hash, context_hash):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT snippet, test_cases, unit_tests FROM artifacts WHERE source_hash = ? AND context_hash = ?",
+                (source_hash, context_hash),
+            ).fetchone()
+            self.counters["hits" if row is not None else "misses"] += 1
+        if row is None:
+            return None
+        snippet, test_cases, unit_tests = row
+        return {"snippet": json.loads(snippet), "test_cases": json.loads(test_cases), "unit_tests": json.loads(unit_tests)}
+
+    def put(self, source_hash, context_hash, snippet, test_cases, unit_tests):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO artifacts (source_hash, context_hash, snippet, test_cases, unit_tests, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (source_hash, context_hash, json.dumps(snippet), json.dumps(test_cases), json.dumps(unit_tests), time.time()),
+            )
+            self.counters["writes"] += 1
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "hit_rate": self.counters["hits"] / lookups if lookups else 0.0}
+
+
+def get_artifact_store():
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            _artifact_store = ArtifactStore()
+        return _artifact_store
+
+
+def _load_results(results_json):
+    # The agents return [] instead of a JSON string when their inputs are invalid
+    if isinstance(results_json, list):
+        return results_json
+    try:
+        return json.loads(results_json)
+    except (TypeError, json.JSONDecodeError):
+        return []
+
+
+def _has_errors(results):
+    return any(isinstance(item, str) or (isinstance(item, dict) and "error" in item) for item in results)
+
+
+async def generate_tests_incrementally(modules_need_testing_json: str, languages_json: str, extracted_text: str, is_regression: bool, tree=None, user_repo=None, store=None):
+    """
+    Generate test cases and unit test code only for functions whose normalized
+    source changed since the last run, reusing stored artifacts for the rest.
+
+    Returns (test_cases_json, test_code_json) covering every function, in the
+    same shape as generate_test_cases and generate_unit_testing_code.
+    """
+    store = store or get_artifact_store()
+    modules = _load_results(modules_need_testing_json)
+    context = context_hash(languages_json, extracted_text, is_regression, user_repo)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FUNCTIONS)
+    results = [None] * len(modules)
+
+    async def process(index, module):
+        key = artifact_key(module)
+        stored = store.get(key, context)
+        if stored is not None:
+            results[index] = (stored["test_cases"], stored["unit_tests"])
+            return
+
+        async with semaphore:
+            test_cases_json = await generate_test_cases(json.dumps([module]), languages_json, extracted_text, is_regression)
+            test_cases = _load_results(test_cases_json)
+            unit_tests = []
+            if test_cases and not _has_errors(test_cases):
+                unit_tests = _load_results(await generate_unit_testing_code(json.dumps(test_cases), languages_json, is_regression, tree, user_repo))
+
+        results[index] = (test_cases, unit_tests)
+        # Partial or failed generations are retried next run instead of being stored
+        if test_cases and unit_tests and not _has_errors(test_cases) and not _has_errors(unit_tests):
+            store.put(key, context, module, test_cases, unit_tests)
+
+    await asyncio.gather(*(process(index, module) for index, module in enumerate(modules)))
+
+    all_test_cases = [item for test_cases, _ in results for item in test_cases]
+    all_unit_tests = [item for _, unit_tests in results for item in unit_tests]
+    print(f"artifact store: {store.stats()}")
+    return json.dumps(all_test_cases, indent=4), json.dumps(all_unit_tests, indent=4)
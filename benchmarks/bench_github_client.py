@@ -0,0 +1,117 @@
+"""
+Benchmark for the GitHub GraphQL client in github/http_client.
+
+Starts a local stub GraphQL server and sends the same queries through the
+old client-per-call pattern (a new httpx.AsyncClient, so a new connection,
+for every query) and through the shared pooled client, reporting latency
+percentiles and throughput for both.
+
+Run from the repository root:
+    python -m benchmarks.bench_github_client --requests 500 --concurrency 16 > bench_output.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from github.http_client import close_client, post_graphql
+
+QUERY = """
+query($owner: String!, $repo_name: String!) {
+  repository(owner: $owner, name: $repo_name) { id }
+}
+"""
+VARIABLES = {"owner": "octocat", "repo_name": "hello-world"}
+
+
+class StubGraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like api.github.com
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps({"data": {"repository": {"id": "R_kgDOStub"}}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(latency):
+    StubGraphQLHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphQLHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/graphql"
+
+
+async def legacy_query(url):
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, headers={"Authorization": "Bearer stub"}, json={"query": QUERY, "variables": VARIABLES}, timeout=None)
+        response.raise_for_status()
+        return response.json()
+
+
+async def pooled_query(url):
+    response = await post_graphql(QUERY, VARIABLES, "stub", url=url)
+    response.raise_for_status()
+    return response.json()
+
+
+async def run(send, url, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await send(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<12} mean {statistics.mean(latencies) * 1000:8.2f}ms  p95 {p95 * 1000:8.2f}ms  {len(latencies) / elapsed:8.1f} req/s")
+    return len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=5, help="Server-side processing time per query")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.latency_ms / 1000)
+    print(f"Stub GraphQL server on {url}, {args.requests} queries, concurrency {args.concurrency}")
+    try:
+        asyncio.run(pooled_query(url))  # Start the shared client so its set-up is not measured
+        legacy_throughput = report("per-call", *asyncio.run(run(legacy_query, url, args.requests, args.concurrency)))
+        pooled_throughput = report("pooled", *asyncio.run(run(pooled_query, url, args.requests, args.concurrency)))
+        print(f"{'throughput speedup':<40} {pooled_throughput / legacy_throughput:8.2f}x")
+    finally:
+        close_client()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Microbenchmark for the tokenizer layer in utils.
+
+Builds a synthetic gitingest dump (50 MB by default) and times the old
+per-call `encoding_for_model` + per-section counting against the cached
+encoder and `count_tokens_batch`, and the old split + recount against the
+single-pass `iter_chunks`.
+
+Run from the repository root:
+    python -m benchmarks.bench_tokenizer --size-mb 50 > bench_output.txt
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktoken import encoding_for_model
+
+from utils import count_tokens_batch, get_encoder, iter_chunks
+
+SECTION_PATTERN = r'(\n={60,}\nFile: [^\n]+)'
+SAMPLE_SOURCE = '''
+def handler_{n}(request, payload=None):
+    """Process the incoming request number {n}."""
+    items = [item for item in payload or [] if item.get("active")]
+    total = sum(item["amount"] for item in items)
+    return {{"count": len(items), "total": total, "id": "{n}"}}
+
+
+class Service{n}:
+    def __init__(self, client):
+        self.client = client
+
+    def fetch(self, key):
+        return self.client.get(f"/api/v1/resource/{{key}}?page={n}")
+'''
+
+
+def build_gitingest_dump(size_mb, seed=0):
+    """Build a gitingest-style dump of roughly `size_mb` megabytes."""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    parts = []
+    size = 0
+    n = 0
+    while size < target:
+        body = "".join(SAMPLE_SOURCE.format(n=n + i) for i in range(rng.randint(1, 8)))
+        section = f"\n{'=' * 64}\nFile: src/module_{n // 50}/file_{n}.py\n{'=' * 64}\n{body}"
+        parts.append(section)
+        size += len(section)
+        n += 1
+    return "".join(parts)
+
+
+def legacy_count_tokens(text, model="gpt-3.5-turbo"):
+    enc = encoding_for_model(model)
+    return len(enc.encode(text))
+
+
+def legacy_split_sizes(text, max_size):
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    for section in re.split(SECTION_PATTERN, text):
+        section_size = legacy_count_tokens(section)
+        if current_size + section_size > max_size:
+            if current_chunk:
+                chunks.append("".join(current_chunk))
+            current_chunk = [section]
+            current_size = section_size
+        else:
+            current_chunk.append(section)
+            current_size += section_size
+    if current_chunk:
+        chunks.append("".join(current_chunk))
+    # The agents counted every chunk a second time
+    return [(chunk, legacy_count_tokens(chunk)) for chunk in chunks]
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--max-tokens", type=int, default=15000)
+    args = parser.parse_args()
+
+    print(f"Building synthetic gitingest dump of {args.size_mb} MB...")
+    dump = build_gitingest_dump(args.size_mb)
+    sections = re.split(SECTION_PATTERN, dump)
+    print(f"{len(sections)} sections, {len(dump) / (1024 * 1024):.1f} MB")
+
+    get_encoder()  # Warm the cache so the first-load cost is not attributed to either side
+
+    legacy_counts, legacy_time = timed("legacy count_tokens per section", lambda: [legacy_count_tokens(s) for s in sections])
+    batch_counts, batch_time = timed("count_tokens_batch", count_tokens_batch, sections)
+    assert legacy_counts == batch_counts, "batch counts differ from legacy counts"
+
+    _, legacy_split_time = timed("legacy split + recount", legacy_split_sizes, dump, args.max_tokens)
+    _, split_time = timed("iter_chunks", lambda: sum(1 for _ in iter_chunks(dump, args.max_tokens)))
+
+    print(f"{'count speedup':<40} {legacy_time / batch_time:8.2f}x")
+    print(f"{'split speedup':<40} {legacy_split_time / split_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
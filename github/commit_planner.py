@@ -0,0 +1,219 @@
+import asyncio
+import os
+import httpx
+from .http_client import post_graphql
+from .repo_metadata_cache import get_repo_metadata_cache
+
+# createCommitOnBranch requests much larger than this are rejected by GitHub
+COMMIT_MAX_BYTES = int(os.getenv("GITHUB_COMMIT_MAX_BYTES", 10 * 1024 * 1024))
+COMMIT_MAX_FILES = int(os.getenv("GITHUB_COMMIT_MAX_FILES", 200))
+COMMIT_RETRIES = int(os.getenv("GITHUB_COMMIT_RETRIES", 3))
+COMMIT_RETRY_BACKOFF_SECONDS = 2
+# Branch commits read back to find parts that landed although their request failed
+COMMIT_RECONCILE_DEPTH = int(os.getenv("GITHUB_COMMIT_RECONCILE_DEPTH", 50))
+
+COMMIT_MUTATION = """
+mutation($input: CreateCommitOnBranchInput!) {
+    createCommitOnBranch(input: $input) {
+        commit {
+            oid
+            url
+        }
+    }
+}
+"""
+
+BRANCH_HISTORY_QUERY = """
+query($owner: String!, $repo_name: String!, $branch_name: String!, $count: Int!) {
+    repository(owner: $owner, name: $repo_name) {
+        ref(qualifiedName: $branch_name) {
+            target {
+                ... on Commit {
+                    history(first: $count) {
+                        nodes {
+                            oid
+                            messageHeadline
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
+def _addition_size(addition):
+    return len(addition["path"]) + len(addition["contents"])
+
+
+def plan_commits(additions, max_bytes=COMMIT_MAX_BYTES, max_files=COMMIT_MAX_FILES):
+    """
+    Lazily group file additions into commits of at most `max_bytes` of
+    base64 contents and `max_files` files.
+
+    `additions` yields {"path", "contents"} dicts or (path, contents) tuples,
+    with contents already base64-encoded. A file larger than `max_bytes` gets
+    a commit of its own.
+    """
+    batch = []
+    batch_bytes = 0
+    for addition in additions:
+        if not isinstance(addition, dict):
+            path, contents = addition
+            addition = {"path": path, "contents": contents}
+        size = _addition_size(addition)
+        if batch and (batch_bytes + size > max_bytes or len(batch) >= max_files):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        if size > max_bytes:
+            print(f"{addition['path']} alone is {size} bytes, over the {max_bytes} bytes commit limit")
+        batch.append(addition)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def new_commit_progress(expected_head_oid):
+    """
+    Progress of a chunked commit, pass it back to commit_in_batches to resume
+    after the last commit that landed.
+    """
+    return {"head_oid": expected_head_oid, "committed_batches": 0, "commits": []}
+
+
+def part_headline(commit_message, index, single):
+    return commit_message if index == 0 and single else f"{commit_message} (part {index + 1})"
+
+
+async def fetch_branch_history(token, repo_owner, repo_name, branch_name, count=COMMIT_RECONCILE_DEPTH):
+    """
+    (oid, headline) of the latest `count` commits of a branch, newest first.
+    Read straight from GitHub, a cached head could be the stale one.
+    """
+    variables = {"owner": repo_owner, "repo_name": repo_name, "branch_name": f"refs/heads/{branch_name}", "count": count}
+    response = await post_graphql(BRANCH_HISTORY_QUERY, variables, token)
+    response.raise_for_status()
+    data = response.json()
+    if "errors" in data:
+        raise Exception(f"Query returned errors: {data['errors']}")
+    ref = ((data.get("data") or {}).get("repository") or {}).get("ref")
+    if ref is None:
+        raise Exception(f"Branch '{branch_name}' does not exist")
+    return [(node["oid"], node["messageHeadline"]) for node in ref["target"]["history"]["nodes"]]
+
+
+async def reconcile_progress(token, repo_owner, repo_name, branch_name, commit_message, progress):
+    """
+    Record in `progress` the parts of the chain that landed on the branch
+    although their request failed, e.g. a mutation that timed out after
+    GitHub applied it. They are the commits on top of progress["head_oid"]
+    whose headlines are the next parts of `commit_message`.
+    """
+    history = await fetch_branch_history(token, repo_owner, repo_name, branch_name)
+    oids = [oid for oid, _ in history]
+    if progress["head_oid"] not in oids:
+        return progress
+    for oid, headline in reversed(history[:oids.index(progress["head_oid"])]):
+        index = progress["committed_batches"]
+        if headline not in (part_headline(commit_message, index, True), part_headline(commit_message, index, False)):
+            # Someone else committed to the branch, the next part will fail on its expected head
+            break
+        print(f"Commit {index + 1} to {repo_owner}/{repo_name}:{branch_name} had landed as {oid}")
+        progress["head_oid"] = oid
+        progress["committed_batches"] += 1
+        progress["commits"].append(oid)
+    return progress
+
+
+def _is_retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, httpx.TransportError)
+
+
+async def commit_batch(token, repo_owner, repo_name, branch_name, additions, headline, expected_head_oid):
+    variables = {
+        "input": {
+            "branch": {
+                "repositoryNameWithOwner": f"{repo_owner}/{repo_name}",
+                "branchName": branch_name
+            },
+            "message": {
+                "headline": headline
+            },
+            "fileChanges": {
+                "additions": additions
+            },
+            "expectedHeadOid": expected_head_oid
+        }
+    }
+
+    response = await post_graphql(COMMIT_MUTATION, variables, token, operation="mutation")
+    response.raise_for_status()
+    data = response.json()
+    if "errors" in data:
+        raise Exception(f"Mutation returned errors: {data['errors']}")
+    return data["data"]["createCommitOnBranch"]["commit"]["oid"]
+
+
+async def commit_in_batches(token, repo_owner, repo_name, branch_name, additions, commit_message, expected_head_oid, progress=None, max_bytes=COMMIT_MAX_BYTES, max_files=COMMIT_MAX_FILES, retries=COMMIT_RETRIES):
+    """
+    Commit `additions` to a branch as a chain of size-bounded commits, each
+    one expecting the previous one as the branch head.
+
+    Network errors, 429 and 5xx responses are retried. Before a retry, and
+    when resuming, the branch is read back so a part whose request failed but
+    which landed anyway is counted instead of committed twice. When the chain
+    still fails, `progress` holds the last commit that landed, calling again
+    with the same additions and `progress` resumes from there.
+
+    `additions` must be re-iterable, a list or EncodedFiles to encode lazily,
+    so a resume can replay it. One-shot iterators raise TypeError.
+
+    Returns the OID of the last commit.
+    """
+    if iter(additions) is additions:
+        raise TypeError("additions must be re-iterable to resume a commit, wrap the files in EncodedFiles")
+    if progress is None:
+        progress = new_commit_progress(expected_head_oid)
+    else:
+        # Resuming, the part that failed last time may have landed
+        await reconcile_progress(token, repo_owner, repo_name, branch_name, commit_message, progress)
+    batches = plan_commits(additions, max_bytes, max_files)
+    batch = next(batches, None)
+    index = 0
+    while batch is not None:
+        next_batch = next(batches, None)
+        if index < progress["committed_batches"]:
+            batch, index = next_batch, index + 1
+            continue
+
+        # A change that fits in one commit keeps its message as is
+        headline = part_headline(commit_message, index, next_batch is None)
+        for attempt in range(retries + 1):
+            try:
+                if attempt:
+                    # The failed attempt may have landed, it must not be committed twice
+                    await reconcile_progress(token, repo_owner, repo_name, branch_name, commit_message, progress)
+                    if progress["committed_batches"] > index:
+                        break
+                oid = await commit_batch(token, repo_owner, repo_name, branch_name, batch, headline, progress["head_oid"])
+                progress["head_oid"] = oid
+                progress["committed_batches"] += 1
+                progress["commits"].append(oid)
+                break
+            except Exception as e:
+                if attempt == retries or not _is_retryable(e):
+                    print(f"Commit {index + 1} to {repo_owner}/{repo_name}:{branch_name} failed after {progress['committed_batches']} committed: {e}")
+                    raise
+                print(f"Commit {index + 1} failed, retrying: {e}")
+                await asyncio.sleep(COMMIT_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+        # The new commit is the branch head, later reads need no query
+        get_repo_metadata_cache().set("branch_oid", f"{repo_owner}/{repo_name}", progress["head_oid"], branch_name)
+        print(f"Committed {len(batch)} file(s) to {repo_owner}/{repo_name}:{branch_name} as {progress['head_oid']}")
+        batch, index = next_batch, index + 1
+
+    return progress["head_oid"]
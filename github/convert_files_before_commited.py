@@ -1,13 +1,83 @@
 import base64
+import os
 
-def convert_data(data):
-    file_paths_and_contents = []
+# A multiple of 3 bytes, so every chunk encodes to base64 without padding
+ENCODE_CHUNK_BYTES = 3 * 256 * 1024
+
+
+def encode_source(source):
+    """
+    Base64-encode a file's contents. `source` is the code as a str or bytes,
+    or a file-like object opened in text or binary mode, which is read in
+    chunks instead of being loaded whole.
+    """
+    if isinstance(source, str):
+        return base64.b64encode(source.encode('utf-8')).decode('ascii')
+    if isinstance(source, (bytes, bytearray)):
+        return base64.b64encode(source).decode('ascii')
+
+    encoded = bytearray()
+    pending = b''
+    while True:
+        chunk = source.read(ENCODE_CHUNK_BYTES)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        pending += chunk
+        # Only whole 3-byte groups are encoded until the end of the file
+        usable = len(pending) - len(pending) % 3
+        encoded += base64.b64encode(pending[:usable])
+        pending = pending[usable:]
+    encoded += base64.b64encode(pending)
+    return encoded.decode('ascii')
+
+
+def encode_file(file_source):
+    """
+    Base64-encode a file streamed from disk. `file_source` is a path, as a str
+    or os.PathLike, or a file-like object.
+    """
+    if isinstance(file_source, (str, os.PathLike)):
+        with open(file_source, 'rb') as file:
+            return encode_source(file)
+    return encode_source(file_source)
+
+
+def iter_encoded_files(data):
+    """
+    Lazily yield (path, base64 contents) for every item, one file at a time.
+
+    Items hold 'file_path' and either 'file_code', the contents, or
+    'file_source', a path (str or os.PathLike) or a file-like object streamed
+    from disk.
+    """
     for item in data:
         path = item['file_path']
-        code = item['file_code']
-        encoded_code = base64.b64encode(code.encode('utf-8')).decode('utf-8')
-        file_paths_and_contents.append((path, encoded_code))
-    return file_paths_and_contents
+        if 'file_source' in item:
+            yield path, encode_file(item['file_source'])
+        else:
+            yield path, encode_source(item['file_code'])
+
+
+class EncodedFiles:
+    """
+    Re-iterable iter_encoded_files(data): every iteration encodes the files
+    again, so a commit can be resumed without holding them all in memory.
+    Fed into update_files_on_github or create_commit, only the commit batches
+    being planned and sent are held in memory.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __iter__(self):
+        return iter_encoded_files(self.data)
+
+
+def convert_data(data):
+    # Encoded as the commit planner reaches each file, not up front
+    return EncodedFiles(data)
 
 
     
@@ -35,7 +35,7 @@ async def create_branch(repository_id, base_oid, branch_name, GITHUB_TOKEN):
     }
     
     # Ensure execute_github_graphql_query is an async function
-    response = await execute_github_graphql_query(query, variables, GITHUB_TOKEN)
+    response = await execute_github_graphql_query(query, variables, GITHUB_TOKEN, operation="mutation")
     
     if 'errors' in response:
         raise Exception(f"Mutation returned errors: {response['errors']}")
@@ -27,7 +27,7 @@ async def create_custom_field(project_id, field_name, data_type, token, options=
     }
     print(f"create_custom_field query: {query}")
     print(f"create_custom_field variables: {variables}")
-    result = await execute_github_graphql_query(query, variables, token)
+    result = await execute_github_graphql_query(query, variables, token, operation="mutation")
     print(f"create_custom_field result: {result}")
     if 'data' in result and 'createProjectV2Field' in result['data']:
         return result['data']['createProjectV2Field']['projectV2Field']
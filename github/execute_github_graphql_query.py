@@ -1,16 +1,7 @@
-import httpx
+from .http_client import post_graphql
 
-async def execute_github_graphql_query(query, variables, token):
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.github.com/graphql",
-            headers=headers,
-            json={"query": query, "variables": variables},
-            timeout=None
-        )
-        response.raise_for_status()
-        return response.json()
+async def execute_github_graphql_query(query, variables, token, operation="query"):
+    # Goes through the process-wide pooled client, `operation` picks the read timeout
+    response = await post_graphql(query, variables, token, operation)
+    response.raise_for_status()
+    return response.json()
@@ -1,4 +1,5 @@
-from .execute_github_graphql_query import execute_github_graphql_query
+from .graphql_batcher import batch_query
+from .repo_metadata_cache import get_repo_metadata_cache
 
 async def get_branch_oid(REPO_OWNER, REPO_NAME, branch_name, GITHUB_TOKEN):
     """
@@ -17,30 +18,32 @@ async def get_branch_oid(REPO_OWNER, REPO_NAME, branch_name, GITHUB_TOKEN):
     Exception: If the query returns errors or if the branch information cannot be retrieved.
     """
 
-    query = """
-    query($owner: String!, $repo_name: String!, $branch_name: String!) {
-      repository(owner: $owner, name: $repo_name) {
-        ref(qualifiedName: $branch_name) {
-          target {
-            ... on Commit {
-              oid
-            }
+    cache = get_repo_metadata_cache()
+    repository_name = f"{REPO_OWNER}/{REPO_NAME}"
+    oid = cache.get("branch_oid", repository_name, branch_name)
+    if oid is not None:
+        return oid
+
+    field = """
+    repository(owner: $owner, name: $repo_name) {
+      ref(qualifiedName: $branch_name) {
+        target {
+          ... on Commit {
+            oid
           }
         }
       }
     }
     """
+    variable_types = {"owner": "String!", "repo_name": "String!", "branch_name": "String!"}
     variables = {"owner": REPO_OWNER, "repo_name": REPO_NAME, "branch_name": f"refs/heads/{branch_name}"}
-    
-    # Ensure execute_github_graphql_query is an async function
-    response = await execute_github_graphql_query(query, variables, GITHUB_TOKEN)
-    
-    if 'errors' in response:
-        raise Exception(f"Query returned errors: {response['errors']}")
 
-    data = response.get("data", {}).get("repository", {}).get("ref")
+    repository = await batch_query(field, variable_types, variables, GITHUB_TOKEN)
+
+    data = (repository or {}).get("ref")
 
     if data is None or data.get("target") is None:
         raise Exception(f"Failed to retrieve branch information for branch '{branch_name}'. Please check the branch name and try again.")
 
+    cache.set("branch_oid", repository_name, data["target"]["oid"], branch_name)
     return data["target"]["oid"]
\ No newline at end of file
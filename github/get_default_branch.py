@@ -0,0 +1,45 @@
+from .graphql_batcher import batch_query
+from .repo_metadata_cache import get_repo_metadata_cache
+
+async def get_default_branch(REPO_OWNER, REPO_NAME, GITHUB_TOKEN):
+    """
+    Retrieves the name of the default branch of a GitHub repository.
+
+    Args:
+    REPO_OWNER (str): The owner of the repository.
+    REPO_NAME (str): The name of the repository.
+    GITHUB_TOKEN (str): A valid GitHub token.
+
+    Returns:
+    str: The name of the default branch, None for an empty repository.
+
+    Raises:
+    Exception: If the query returns errors or if the repository information cannot be retrieved.
+    """
+
+    cache = get_repo_metadata_cache()
+    repository = f"{REPO_OWNER}/{REPO_NAME}"
+    default_branch = cache.get("default_branch", repository)
+    if default_branch is not None:
+        return default_branch
+
+    field = """
+    repository(owner: $owner, name: $repo_name) {
+      id
+      defaultBranchRef {
+        name
+      }
+    }
+    """
+    variable_types = {"owner": "String!", "repo_name": "String!"}
+    variables = {"owner": REPO_OWNER, "repo_name": REPO_NAME}
+
+    data = await batch_query(field, variable_types, variables, GITHUB_TOKEN)
+    if data is None:
+        raise Exception("Failed to retrieve repository information. Please check the repository details and try again.")
+
+    cache.set("repository_id", repository, data["id"])
+    if data.get("defaultBranchRef") is None:
+        return None
+    cache.set("default_branch", repository, data["defaultBranchRef"]["name"])
+    return data["defaultBranchRef"]["name"]
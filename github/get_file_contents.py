@@ -0,0 +1,77 @@
+import asyncio
+import os
+from .execute_github_graphql_query import execute_github_graphql_query
+
+MAX_PATHS_PER_QUERY = int(os.getenv("GITHUB_MAX_PATHS_PER_QUERY", 50))
+MAX_BLOB_BYTES = int(os.getenv("GITHUB_MAX_BLOB_BYTES", 512 * 1024))  # Larger files are not analyzed
+
+
+def build_file_contents_query(count):
+    """
+    Build an aliased query reading `count` blobs of one repository, `file<i>`
+    resolving the `$expression<i>` ("<commit sha>:<path>") variable.
+    """
+    declarations = ", ".join(f"$expression{index}: String!" for index in range(count))
+    fields = "\n".join(
+        f"file{index}: object(expression: $expression{index}) {{ ... on Blob {{ text byteSize isBinary }} }}"
+        for index in range(count)
+    )
+    return f"""
+    query($owner: String!, $repo_name: String!, {declarations}) {{
+      repository(owner: $owner, name: $repo_name) {{
+        {fields}
+      }}
+    }}
+    """
+
+
+async def get_file_contents(REPO_OWNER, REPO_NAME, commit_oid, paths, GITHUB_TOKEN, max_bytes=MAX_BLOB_BYTES, batch_size=MAX_PATHS_PER_QUERY):
+    """
+    Retrieves the text of many files at one commit, one GraphQL query per batch of paths.
+
+    Args:
+    REPO_OWNER (str): The owner of the repository.
+    REPO_NAME (str): The name of the repository.
+    commit_oid (str): The commit (or branch) to read the files at.
+    paths (list): The file paths to read.
+    GITHUB_TOKEN (str): A valid GitHub token.
+
+    Returns:
+    dict: Path to text, in the order of `paths`. Missing, binary and oversized files are left out.
+
+    Raises:
+    Exception: If a query returns errors.
+    """
+    paths = list(dict.fromkeys(paths))
+
+    async def fetch_batch(batch):
+        variables = {"owner": REPO_OWNER, "repo_name": REPO_NAME}
+        for index, path in enumerate(batch):
+            variables[f"expression{index}"] = f"{commit_oid}:{path}"
+
+        response = await execute_github_graphql_query(build_file_contents_query(len(batch)), variables, GITHUB_TOKEN)
+
+        if 'errors' in response:
+            raise Exception(f"Query returned errors: {response['errors']}")
+
+        repository = response.get("data", {}).get("repository") or {}
+        contents = {}
+        for index, path in enumerate(batch):
+            blob = repository.get(f"file{index}")
+            if not blob:
+                print(f"Skipping {path}: not found at {commit_oid}")
+            elif blob.get("isBinary"):
+                print(f"Skipping {path}: binary file")
+            elif blob.get("text") is None or blob.get("byteSize", 0) > max_bytes:
+                print(f"Skipping {path}: {blob.get('byteSize')} bytes is over the {max_bytes} bytes limit")
+            else:
+                contents[path] = blob["text"]
+        return contents
+
+    batches = [paths[start:start + batch_size] for start in range(0, len(paths), batch_size)]
+    results = await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+
+    contents = {}
+    for batch_contents in results:
+        contents.update(batch_contents)
+    return contents
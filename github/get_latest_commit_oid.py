@@ -1,4 +1,5 @@
-from .execute_github_graphql_query import execute_github_graphql_query
+from .graphql_batcher import batch_query
+from .repo_metadata_cache import get_repo_metadata_cache
 
 async def get_latest_commit_oid(repo_owner, repo_name, branch_name, token):
     """
@@ -17,31 +18,32 @@ async def get_latest_commit_oid(repo_owner, repo_name, branch_name, token):
     Exception: If the query returns errors or if the branch does not exist.
     """
 
-    query = """
-    query($repoOwner: String!, $repoName: String!, $branchName: String!) {
-      repository(owner: $repoOwner, name: $repoName) {
-        ref(qualifiedName: $branchName) {
-          target {
-            oid
-          }
+    cache = get_repo_metadata_cache()
+    oid = cache.get("branch_oid", f"{repo_owner}/{repo_name}", branch_name)
+    if oid is not None:
+        return oid
+
+    field = """
+    repository(owner: $repoOwner, name: $repoName) {
+      ref(qualifiedName: $branchName) {
+        target {
+          oid
         }
       }
     }
     """
+    variable_types = {"repoOwner": "String!", "repoName": "String!", "branchName": "String!"}
     variables = {
         "repoOwner": repo_owner,
         "repoName": repo_name,
         "branchName": branch_name
     }
-    
-    # Ensure execute_github_graphql_query is an async function
-    response = await execute_github_graphql_query(query, variables, token)
-    
-    if "errors" in response:
-        raise Exception(f"Query returned errors: {response['errors']}")
-
-    ref = response["data"]["repository"]["ref"]
+
+    repository = await batch_query(field, variable_types, variables, token)
+
+    ref = (repository or {}).get("ref")
     if ref is None:
         raise Exception(f"Branch '{branch_name}' does not exist")
 
+    cache.set("branch_oid", f"{repo_owner}/{repo_name}", ref["target"]["oid"], branch_name)
     return ref["target"]["oid"]
\ No newline at end of file
@@ -1,7 +1,13 @@
 from .execute_github_graphql_query import execute_github_graphql_query
+from .repo_metadata_cache import get_repo_metadata_cache
 
 async def get_repo_id(repo_owner, repo_name, token):
     """Gets the ID of a GitHub repository."""
+    cache = get_repo_metadata_cache()
+    repository_id = cache.get("repository_id", f"{repo_owner}/{repo_name}")
+    if repository_id is not None:
+        return repository_id
+
     query = """
     query($owner: String!, $name: String!) {
       repository(owner: $owner, name: $name) {
@@ -12,6 +18,7 @@ async def get_repo_id(repo_owner, repo_name, token):
     variables = {"owner": repo_owner, "name": repo_name}
     result = await execute_github_graphql_query(query, variables, token)
     if 'data' in result and 'repository' in result['data']:
+        cache.set("repository_id", f"{repo_owner}/{repo_name}", result['data']['repository']['id'])
         return result['data']['repository']['id']
     else:
         raise Exception(f"Cannot find repository with owner: {repo_owner} and name: {repo_name}")
\ No newline at end of file
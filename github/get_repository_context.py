@@ -0,0 +1,32 @@
+import asyncio
+from .get_branch_oid import get_branch_oid
+from .get_default_branch import get_default_branch
+from .get_repository_id import get_repository_id
+from .list_branches import list_branches
+
+async def get_repository_context(REPO_OWNER, REPO_NAME, branch_name, GITHUB_TOKEN):
+    """
+    Retrieves everything a commit-back needs about a repository in one round trip.
+
+    The reads are issued together so the GraphQL batcher merges them into a
+    single query.
+
+    Args:
+    REPO_OWNER (str): The owner of the repository.
+    REPO_NAME (str): The name of the repository.
+    branch_name (str): The branch the commit goes to.
+    GITHUB_TOKEN (str): A valid GitHub token.
+
+    Returns:
+    dict: The repository ID, the default branch, the OID of the branch head and the branch names.
+
+    Raises:
+    Exception: If any of the reads fails.
+    """
+    repository_id, default_branch, branch_oid, branches = await asyncio.gather(
+        get_repository_id(REPO_OWNER, REPO_NAME, GITHUB_TOKEN),
+        get_default_branch(REPO_OWNER, REPO_NAME, GITHUB_TOKEN),
+        get_branch_oid(REPO_OWNER, REPO_NAME, branch_name, GITHUB_TOKEN),
+        list_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN),
+    )
+    return {"repository_id": repository_id, "default_branch": default_branch, "branch_oid": branch_oid, "branches": branches}
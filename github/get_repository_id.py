@@ -1,4 +1,5 @@
-from .execute_github_graphql_query import execute_github_graphql_query
+from .graphql_batcher import batch_query
+from .repo_metadata_cache import get_repo_metadata_cache
 
 async def get_repository_id(REPO_OWNER, REPO_NAME, GITHUB_TOKEN):
     """
@@ -16,23 +17,28 @@ async def get_repository_id(REPO_OWNER, REPO_NAME, GITHUB_TOKEN):
     Exception: If the query returns errors or if the repository information cannot be retrieved.
     """
 
-    query = """
-    query($owner: String!, $repo_name: String!) {
-      repository(owner: $owner, name: $repo_name) {
-        id
+    cache = get_repo_metadata_cache()
+    repository = f"{REPO_OWNER}/{REPO_NAME}"
+    repository_id = cache.get("repository_id", repository)
+    if repository_id is not None:
+        return repository_id
+
+    field = """
+    repository(owner: $owner, name: $repo_name) {
+      id
+      defaultBranchRef {
+        name
       }
     }
     """
+    variable_types = {"owner": "String!", "repo_name": "String!"}
     variables = {"owner": REPO_OWNER, "repo_name": REPO_NAME}
-    
-    # Ensure execute_github_graphql_query is an async function
-    response = await execute_github_graphql_query(query, variables, GITHUB_TOKEN)
-    
-    if 'errors' in response:
-        raise Exception(f"Query returned errors: {response['errors']}")
-
-    data = response.get("data", {}).get("repository")
+
+    data = await batch_query(field, variable_types, variables, GITHUB_TOKEN)
     if data is None:
         raise Exception("Failed to retrieve repository information. Please check the repository details and try again.")
-    
+
+    cache.set("repository_id", repository, data["id"])
+    if data.get("defaultBranchRef"):
+        cache.set("default_branch", repository, data["defaultBranchRef"]["name"])
     return data["id"]
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import re
+import weakref
+from collections import Counter
+from .execute_github_graphql_query import execute_github_graphql_query
+from .rate_limiter import budget_key, get_rate_limiter
+
+GITHUB_BATCH_WINDOW_SECONDS = float(os.getenv("GITHUB_BATCH_WINDOW_MS", 5)) / 1000
+GITHUB_BATCH_MAX_OPERATIONS = int(os.getenv("GITHUB_BATCH_MAX_OPERATIONS", 25))
+VARIABLE_PATTERN = re.compile(r"\$(\w+)")
+
+_batchers = weakref.WeakKeyDictionary()
+
+
+class GraphQLBatcher:
+    """
+    Merges GraphQL reads issued within `window` seconds of each other (and
+    with the same token) into one aliased query.
+
+    Each read is a single top-level field, e.g.
+    `repository(owner: $owner, name: $repo_name) { id }`, with its own
+    variables. Variables are prefixed per read so reads cannot clash, and the
+    response is split back by alias. Errors are routed to the read their
+    `path` points at, errors without a path fail the whole batch.
+    """
+
+    def __init__(self, window=GITHUB_BATCH_WINDOW_SECONDS, max_operations=GITHUB_BATCH_MAX_OPERATIONS):
+        self.window = window
+        self.max_operations = max_operations
+        self.pending = {}
+        self.flush_handles = {}
+        # The loop only keeps weak references to tasks, in-flight batches are held here
+        self.tasks = set()
+        self.counters = Counter()
+
+    async def query(self, field, variable_types, variables, token):
+        """
+        Queue a read and return the value of its field, None when GitHub
+        returned null for it.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(token, [])
+        batch.append((field, variable_types, variables, future))
+        self.counters["operations"] += 1
+
+        if len(batch) >= self.max_operations:
+            self._flush(token)
+        elif token not in self.flush_handles:
+            self.flush_handles[token] = loop.call_later(self.window, self._flush, token)
+        return await future
+
+    def _flush(self, token):
+        handle = self.flush_handles.pop(token, None)
+        if handle:
+            handle.cancel()
+        batch = self.pending.pop(token, [])
+        if batch:
+            task = asyncio.ensure_future(self._execute(batch, token))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    @staticmethod
+    def build_query(batch):
+        declarations = []
+        fields = []
+        variables = {}
+        for index, (field, variable_types, values, _) in enumerate(batch):
+            prefix = f"op{index}_"
+            renamed = VARIABLE_PATTERN.sub(
+                lambda match: f"${prefix}{match.group(1)}" if match.group(1) in variable_types else match.group(0),
+                field,
+            )
+            fields.append(f"op{index}: {renamed.strip()}")
+            declarations.extend(f"${prefix}{name}: {type_name}" for name, type_name in variable_types.items())
+            variables.update({f"{prefix}{name}": value for name, value in values.items()})
+
+        # The cost and remaining budget feed the rate limiter
+        fields.append("rateLimit { cost remaining resetAt limit }")
+        header = f"query({', '.join(declarations)})" if declarations else "query"
+        body = "\n".join(fields)
+        return f"{header} {{\n{body}\n}}", variables
+
+    async def _execute(self, batch, token):
+        query, variables = self.build_query(batch)
+        self.counters["requests"] += 1
+        try:
+            response = await execute_github_graphql_query(query, variables, token)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        errors_by_alias = {}
+        for error in response.get("errors") or []:
+            path = error.get("path") or [None]
+            errors_by_alias.setdefault(path[0], []).append(error)
+
+        data = response.get("data") or {}
+        get_rate_limiter().record_graphql(budget_key(token), data.get("rateLimit"))
+        for index, (*_, future) in enumerate(batch):
+            # The caller may have been cancelled while the batch was in flight
+            if future.done():
+                continue
+            alias = f"op{index}"
+            errors = errors_by_alias.get(alias, []) + errors_by_alias.get(None, [])
+            if errors:
+                future.set_exception(Exception(f"Query returned errors: {errors}"))
+            else:
+                future.set_result(data.get(alias))
+
+    def stats(self):
+        requests = self.counters["requests"]
+        return {**self.counters, "operations_per_request": self.counters["operations"] / requests if requests else 0.0}
+
+
+def get_batcher():
+    """
+    Batcher of the running event loop, reads can only be merged within one loop.
+    """
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = GraphQLBatcher()
+    return batcher
+
+
+async def batch_query(field, variable_types, variables, token):
+    """
+    Read one field through the batcher of the running loop, merged with the
+    other reads issued at the same time into one query.
+    """
+    return await get_batcher().query(field, variable_types, variables, token)
@@ -0,0 +1,108 @@
+import asyncio
+import atexit
+import os
+import threading
+import httpx
+from .rate_limiter import GITHUB_RATE_LIMIT_RETRIES, budget_key, get_rate_limiter, github_request_priority
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", 20))
+GITHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", 10))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", 30))
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", 5))
+# Read timeouts per operation, mutations (commits, merges) take longer on GitHub's side than queries
+OPERATION_TIMEOUTS = {
+    "query": float(os.getenv("GITHUB_QUERY_TIMEOUT", 30)),
+    "mutation": float(os.getenv("GITHUB_MUTATION_TIMEOUT", 60)),
+}
+
+try:
+    import h2  # noqa: F401  httpx only negotiates HTTP/2 when h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_io_loop = None
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_timeout(operation="query"):
+    return httpx.Timeout(OPERATION_TIMEOUTS[operation], connect=GITHUB_CONNECT_TIMEOUT)
+
+
+def _get_client():
+    """
+    Start the process-wide client on its own event loop thread on first use.
+
+    httpx clients are bound to the loop they were created on, while the
+    webhook workers and Streamlit each run their own loops. Requests are
+    therefore all executed on one background loop so they share a single
+    connection pool.
+    """
+    global _io_loop, _client
+    with _client_lock:
+        if _client is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="github-http", daemon=True).start()
+
+            async def create_client():
+                return httpx.AsyncClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(
+                        max_connections=GITHUB_MAX_CONNECTIONS,
+                        max_keepalive_connections=GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=build_timeout(),
+                )
+
+            _client = asyncio.run_coroutine_threadsafe(create_client(), loop).result()
+            _io_loop = loop
+        return _io_loop, _client
+
+
+async def post_graphql(query, variables, token, operation="query", url=GITHUB_GRAPHQL_URL, priority=None):
+    """
+    POST a GraphQL document through the shared client and return the httpx.Response.
+
+    `operation` ("query" or "mutation") selects the read timeout. The request
+    waits for the token's rate limit budget, at `priority` or the caller's
+    request_priority, and is retried when a rate limit rejects it. Cancelling
+    the caller cancels the request on the I/O loop.
+    """
+    loop, client = _get_client()
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    # Context variables do not cross into the I/O loop, the priority is read here
+    priority = github_request_priority.get() if priority is None else priority
+    limiter = get_rate_limiter()
+    key = budget_key(token)
+
+    async def send():
+        for attempt in range(GITHUB_RATE_LIMIT_RETRIES + 1):
+            await limiter.acquire(key, priority)
+            response = await client.post(url, headers=headers, json={"query": query, "variables": variables}, timeout=build_timeout(operation))
+            if not limiter.record_response(key, response) or attempt == GITHUB_RATE_LIMIT_RETRIES:
+                return response
+            limiter.counters["retried"] += 1
+
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(send(), loop))
+
+
+def close_client():
+    global _io_loop, _client
+    with _client_lock:
+        if _client is None:
+            return
+        loop, client = _io_loop, _client
+        _io_loop = _client = None
+    try:
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(close_client)
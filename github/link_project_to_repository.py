@@ -20,7 +20,7 @@ async def link_project_to_repository(project_id, repo_id, token):
     }
     print(f"link_project_to_repository query: {query}")
     print(f"link_project_to_repository variables: {variables}")
-    result = await execute_github_graphql_query(query, variables, token)
+    result = await execute_github_graphql_query(query, variables, token, operation="mutation")
     print(f"link_project_to_repository result: {result}")
     if 'data' in result and 'linkProjectV2ToRepository' in result['data']:
         return result['data']['linkProjectV2ToRepository']['repository']['id']
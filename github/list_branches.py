@@ -1,6 +1,87 @@
-from .execute_github_graphql_query import execute_github_graphql_query
+import asyncio
+from .graphql_batcher import batch_query
 
-async def list_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN):
+BRANCHES_PAGE_SIZE = 100  # GitHub's maximum for `first`
+
+
+async def fetch_branches_page(REPO_OWNER, REPO_NAME, ref_prefix, name_query, cursor, GITHUB_TOKEN, page_size=BRANCHES_PAGE_SIZE):
+    """
+    Retrieves one page of refs under `ref_prefix`. Returns (names, end_cursor, has_next_page).
+    """
+    field = """
+    repository(owner: $owner, name: $repo_name) {
+      refs(refPrefix: $ref_prefix, query: $name_query, first: $first, after: $after, orderBy: {field: ALPHABETICAL, direction: ASC}) {
+        pageInfo {
+          endCursor
+          hasNextPage
+        }
+        nodes {
+          name
+        }
+      }
+    }
+    """
+    variable_types = {"owner": "String!", "repo_name": "String!", "ref_prefix": "String!", "name_query": "String", "first": "Int!", "after": "String"}
+    variables = {
+        "owner": REPO_OWNER,
+        "repo_name": REPO_NAME,
+        "ref_prefix": ref_prefix,
+        "name_query": name_query,
+        "first": page_size,
+        "after": cursor,
+    }
+
+    repository = await batch_query(field, variable_types, variables, GITHUB_TOKEN)
+    if repository is None:
+        raise Exception(f"Failed to retrieve branches of {REPO_OWNER}/{REPO_NAME}. Please check the repository details and try again.")
+
+    refs = repository["refs"]
+    return [node["name"] for node in refs["nodes"]], refs["pageInfo"]["endCursor"], refs["pageInfo"]["hasNextPage"]
+
+
+async def iter_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN, prefix="", prefetch=True, page_size=BRANCHES_PAGE_SIZE):
+    """
+    Yields the branch names of a GitHub repository page by page, as the pages arrive.
+
+    Args:
+    REPO_OWNER (str): The owner of the repository.
+    REPO_NAME (str): The name of the repository.
+    GITHUB_TOKEN (str): A valid GitHub token.
+    prefix (str): Only yield branches whose name starts with it. Its directory part
+        ("feature/" in "feature/login") is pushed down into `refPrefix`, the rest
+        into the refs `query`.
+    prefetch (bool): Request the next page while the caller consumes the current one.
+
+    Raises:
+    Exception: If a query returns errors.
+    """
+    directory, _, name_start = prefix.rpartition("/")
+    directory = f"{directory}/" if directory else ""
+    ref_prefix = f"refs/heads/{directory}"
+
+    def fetch(cursor):
+        return fetch_branches_page(REPO_OWNER, REPO_NAME, ref_prefix, name_start or None, cursor, GITHUB_TOKEN, page_size)
+
+    page = asyncio.ensure_future(fetch(None))
+    try:
+        while page is not None:
+            names, cursor, has_next_page = await page
+            page = None
+            if has_next_page:
+                page = asyncio.ensure_future(fetch(cursor)) if prefetch else fetch(cursor)
+
+            for name in names:
+                # Names are relative to refPrefix, and `query` matches anywhere in the name
+                if name.startswith(name_start):
+                    yield f"{directory}{name}"
+    finally:
+        if isinstance(page, asyncio.Future):
+            page.cancel()
+        elif page is not None:
+            page.close()
+
+
+async def list_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN, prefix=""):
     """
     Retrieves a list of branches in a GitHub repository.
 
@@ -8,34 +89,12 @@ async def list_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN):
     REPO_OWNER (str): The owner of the repository.
     REPO_NAME (str): The name of the repository.
     GITHUB_TOKEN (str): A valid GitHub token.
+    prefix (str): Only list branches whose name starts with it.
 
     Returns:
-    list: A list of branch names.
+    list: A list of branch names, across every page.
 
     Raises:
     Exception: If the query returns errors.
     """
-
-    query = """
-    query($owner: String!, $repo_name: String!) {
-      repository(owner: $owner, name: $repo_name) {
-        refs(refPrefix: "refs/heads/", first: 100) {
-          edges {
-            node {
-              name
-            }
-          }
-        }
-      }
-    }
-    """
-    variables = {"owner": REPO_OWNER, "repo_name": REPO_NAME}
-    
-    # Ensure execute_github_graphql_query is an async function
-    response = await execute_github_graphql_query(query, variables, GITHUB_TOKEN)
-    
-    if 'errors' in response:
-        raise Exception(f"Query returned errors: {response['errors']}")
-
-    branches = response.get("data", {}).get("repository", {}).get("refs", {}).get("edges", [])
-    return [branch["node"]["name"] for branch in branches]
\ No newline at end of file
+    return [name async for name in iter_branches(REPO_OWNER, REPO_NAME, GITHUB_TOKEN, prefix)]
@@ -1,17 +1,19 @@
-import httpx
+from .http_client import post_graphql
 from .get_repository_id import get_repository_id
+from .repo_metadata_cache import get_repo_metadata_cache
 import uuid
 
-async def merge_branch_via_graphql(repo_owner, repo_name, branch_name, github_token, github_email):
+async def merge_branch_via_graphql(repo_owner, repo_name, branch_name, github_token, github_email, repository_id=None):
     
-    repository_id = await get_repository_id(repo_owner, repo_name, github_token)
+    # Callers that already looked up the repository context pass its ID
+    if repository_id is None:
+        repository_id = await get_repository_id(repo_owner, repo_name, github_token)
     
     
     
     """
-    Calls GitHub's GraphQL API to merge a branch using httpx.
+    Calls GitHub's GraphQL API to merge a branch through the shared client.
     """
-    graphql_url = "https://api.github.com/graphql"
     
     merge_query = """
     mutation MergeBranch($input: MergeBranchInput!) {
@@ -35,17 +37,7 @@ async def merge_branch_via_graphql(repo_owner, repo_name, branch_name, github_to
         }
     }
 
-    headers = {
-        "Authorization": f"Bearer {github_token}",
-        "Content-Type": "application/json"
-    }
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            graphql_url,
-            json={"query": merge_query, "variables": variables},
-            headers=headers
-        )
+    response = await post_graphql(merge_query, variables, github_token, operation="mutation")
 
     if response.status_code != 200:
         raise Exception(f"GitHub GraphQL API call failed with status {response.status_code}: {response.text}")
@@ -54,4 +46,6 @@ async def merge_branch_via_graphql(repo_owner, repo_name, branch_name, github_to
     if 'errors' in response_data:
         raise Exception(f"GitHub GraphQL API returned errors: {response_data['errors']}")
 
+    # The merge moved the head of main
+    get_repo_metadata_cache().invalidate("branch_oid", f"{repo_owner}/{repo_name}", "main")
     return response_data['data']['mergeBranch']
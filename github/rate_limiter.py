@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+INTERACTIVE = 0
+BACKFILL = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKFILL: "backfill"}
+
+# Requests left in a window that only interactive jobs may use
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", 200))
+GITHUB_RATE_LIMIT_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", 3))
+# Wait applied to a secondary rate limit that comes without Retry-After
+SECONDARY_RATE_LIMIT_WAIT_SECONDS = 60
+MAX_POLL_SECONDS = 1.0
+
+github_request_priority = contextvars.ContextVar("github_request_priority", default=INTERACTIVE)
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Run the GitHub calls made inside the block, including those of event loops
+    started inside it, with `priority`.
+    """
+    reset_token = github_request_priority.set(priority)
+    try:
+        yield
+    finally:
+        github_request_priority.reset(reset_token)
+
+
+def budget_key(token):
+    # Budgets are tracked per token without keeping the token itself in the gauge
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:12] if token else "anonymous"
+
+
+class RateLimiter:
+    """
+    Per-token view of GitHub's rate limit budget, shared by every thread and
+    event loop.
+
+    The budget is read from the X-RateLimit-* headers of every response and
+    from the `rateLimit` field of batched GraphQL queries. Requests wait while
+    a token is blocked by Retry-After or a secondary rate limit, or once its
+    remaining budget runs low. Backfill requests stop GITHUB_RATE_LIMIT_RESERVE
+    requests earlier than interactive ones, and always yield to interactive
+    requests waiting on the same token.
+    """
+
+    def __init__(self, reserve=GITHUB_RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.budgets = {}
+        self.counters = Counter()
+
+    def _budget(self, key):
+        budget = self.budgets.get(key)
+        if budget is None:
+            budget = self.budgets[key] = {
+                "limit": None,
+                "remaining": None,
+                "reset_at": 0.0,
+                "blocked_until": 0.0,
+                "waiting": Counter(),
+            }
+        return budget
+
+    def _delay(self, key, priority):
+        """
+        Seconds the request must wait, 0 when it can go now. Takes one unit of
+        budget when it returns 0.
+        """
+        now = time.time()
+        with self.lock:
+            budget = self._budget(key)
+            if budget["reset_at"] and budget["reset_at"] <= now and budget["limit"] is not None:
+                budget["remaining"] = budget["limit"]
+                budget["reset_at"] = 0.0
+
+            if budget["blocked_until"] > now:
+                return budget["blocked_until"] - now
+            if priority != INTERACTIVE and budget["waiting"][INTERACTIVE]:
+                return MAX_POLL_SECONDS / 10
+            floor = 0 if priority == INTERACTIVE else self.reserve
+            if budget["remaining"] is not None and budget["remaining"] <= floor:
+                return max(budget["reset_at"] - now, MAX_POLL_SECONDS / 10)
+
+            if budget["remaining"] is not None:
+                budget["remaining"] -= 1
+            return 0
+
+    def _waiting(self, key, priority, change):
+        with self.lock:
+            self._budget(key)["waiting"][priority] += change
+
+    async def acquire(self, key, priority=INTERACTIVE):
+        delay = self._delay(key, priority)
+        if not delay:
+            return
+        self.counters[f"throttled_{PRIORITY_NAMES[priority]}"] += 1
+        self._waiting(key, priority, 1)
+        try:
+            while delay:
+                await asyncio.sleep(min(delay, MAX_POLL_SECONDS))
+                delay = self._delay(key, priority)
+        finally:
+            self._waiting(key, priority, -1)
+
+    def acquire_sync(self, key, priority=INTERACTIVE):
+        delay = self._delay(key, priority)
+        if not delay:
+            return
+        self.counters[f"throttled_{PRIORITY_NAMES[priority]}"] += 1
+        self._waiting(key, priority, 1)
+        try:
+            while delay:
+                time.sleep(min(delay, MAX_POLL_SECONDS))
+                delay = self._delay(key, priority)
+        finally:
+            self._waiting(key, priority, -1)
+
+    def record_response(self, key, response):
+        """
+        Update the budget from an httpx or requests response. Returns True when
+        the request was rejected by a rate limit and should be retried.
+        """
+        headers = response.headers
+        now = time.time()
+        with self.lock:
+            budget = self._budget(key)
+            if headers.get("X-RateLimit-Limit"):
+                budget["limit"] = int(headers["X-RateLimit-Limit"])
+            if headers.get("X-RateLimit-Remaining"):
+                budget["remaining"] = int(headers["X-RateLimit-Remaining"])
+            if headers.get("X-RateLimit-Reset"):
+                budget["reset_at"] = float(headers["X-RateLimit-Reset"])
+
+            if response.status_code not in (403, 429):
+                return False
+            retry_after = headers.get("Retry-After")
+            if retry_after:
+                wait = float(retry_after)
+            elif budget["remaining"] == 0:
+                wait = max(budget["reset_at"] - now, 1)
+            elif "rate limit" in response.text.lower():
+                wait = SECONDARY_RATE_LIMIT_WAIT_SECONDS
+            else:
+                # A plain permission error, retrying will not help
+                return False
+            budget["blocked_until"] = max(budget["blocked_until"], now + wait)
+            self.counters["rate_limited"] += 1
+        print(f"GitHub rate limit hit for token {key}, pausing its requests for {wait:.0f}s")
+        return True
+
+    def record_graphql(self, key, rate_limit):
+        """
+        Update the budget from a GraphQL `rateLimit { cost remaining resetAt limit }` field.
+        """
+        if not rate_limit:
+            return
+        with self.lock:
+            budget = self._budget(key)
+            budget["remaining"] = rate_limit["remaining"]
+            budget["limit"] = rate_limit.get("limit", budget["limit"])
+            budget["reset_at"] = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00")).timestamp()
+            self.counters["graphql_cost"] += rate_limit.get("cost", 0)
+
+    def snapshot(self):
+        """
+        Live budget gauge, per token.
+        """
+        now = time.time()
+        with self.lock:
+            return {
+                "tokens": {
+                    key: {
+                        "limit": budget["limit"],
+                        "remaining": budget["remaining"],
+                        "resets_in": max(0.0, budget["reset_at"] - now) if budget["reset_at"] else None,
+                        "blocked_for": max(0.0, budget["blocked_until"] - now),
+                        "waiting": {PRIORITY_NAMES[priority]: count for priority, count in budget["waiting"].items() if count},
+                    }
+                    for key, budget in self.budgets.items()
+                },
+                **self.counters,
+            }
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+
+def rate_limited_request(send, token, priority=None):
+    """
+    Run a synchronous `send()` returning a requests response under the rate
+    limiter, retrying it when a rate limit rejected it.
+    """
+    limiter = get_rate_limiter()
+    key = budget_key(token)
+    priority = github_request_priority.get() if priority is None else priority
+    for attempt in range(GITHUB_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire_sync(key, priority)
+        response = send()
+        if not limiter.record_response(key, response) or attempt == GITHUB_RATE_LIMIT_RETRIES:
+            return response
+        limiter.counters["retried"] += 1
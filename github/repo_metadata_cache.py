@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+REPO_METADATA_CACHE_PATH = os.getenv("REPO_METADATA_CACHE_PATH", "")  # Empty keeps the cache in memory only
+REPO_METADATA_OID_TTL_SECONDS = int(os.getenv("REPO_METADATA_OID_TTL_SECONDS", 60))
+REPO_METADATA_DEFAULT_BRANCH_TTL_SECONDS = int(os.getenv("REPO_METADATA_DEFAULT_BRANCH_TTL_SECONDS", 3600))
+
+# Node IDs never change, branch heads and the default branch do
+PERMANENT_KINDS = ("repository_id",)
+
+_repo_metadata_cache = None
+_repo_metadata_cache_lock = threading.Lock()
+
+
+def branch_short_name(branch_name):
+    return branch_name[len("refs/heads/"):] if branch_name.startswith("refs/heads/") else branch_name
+
+
+class RepoMetadataCache:
+    """
+    In-process cache of repository node IDs, default branches and branch head
+    OIDs, optionally persisted to a JSON file.
+
+    Node IDs are kept forever, the other entries expire after their TTL. Push
+    webhooks refresh branch heads without a query.
+    """
+
+    def __init__(self, path=REPO_METADATA_CACHE_PATH, oid_ttl=REPO_METADATA_OID_TTL_SECONDS, default_branch_ttl=REPO_METADATA_DEFAULT_BRANCH_TTL_SECONDS):
+        self.path = path
+        self.ttls = {"branch_oid": oid_ttl, "default_branch": default_branch_ttl}
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.counters = Counter()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as cache_file:
+                    self.entries = {key: tuple(entry) for key, entry in json.load(cache_file).items()}
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable repository metadata cache {path}: {e}")
+
+    @staticmethod
+    def key(kind, repository, branch=None):
+        # GitHub owner and repository names are case-insensitive
+        parts = [kind, repository.lower()]
+        if branch is not None:
+            parts.append(branch_short_name(branch))
+        return "|".join(parts)
+
+    def get(self, kind, repository, branch=None):
+        key = self.key(kind, repository, branch)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self.entries[key]
+                self.counters["expired"] += 1
+                entry = None
+            self.counters["hits" if entry is not None else "misses"] += 1
+        return entry[0] if entry is not None else None
+
+    def set(self, kind, repository, value, branch=None):
+        expires_at = None if kind in PERMANENT_KINDS else time.time() + self.ttls[kind]
+        with self.lock:
+            self.entries[self.key(kind, repository, branch)] = (value, expires_at)
+            self.counters["writes"] += 1
+            self._save()
+
+    def invalidate(self, kind, repository, branch=None):
+        with self.lock:
+            if self.entries.pop(self.key(kind, repository, branch), None) is not None:
+                self.counters["invalidations"] += 1
+                self._save()
+
+    def update_from_push_payload(self, payload):
+        """
+        Record what a push webhook already tells us: the repository node ID,
+        its default branch and the new head of the pushed branch.
+        """
+        repository = payload.get('repository') or {}
+        full_name = repository.get('full_name')
+        if not full_name:
+            return
+        if repository.get('node_id'):
+            self.set("repository_id", full_name, repository['node_id'])
+        if repository.get('default_branch'):
+            self.set("default_branch", full_name, repository['default_branch'])
+
+        ref = payload.get('ref') or ""
+        if not ref.startswith("refs/heads/"):
+            return
+        if payload.get('deleted'):
+            self.invalidate("branch_oid", full_name, ref)
+        elif payload.get('after'):
+            self.set("branch_oid", full_name, payload['after'], ref)
+
+    def _save(self):
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump(self.entries, cache_file)
+        os.replace(temporary_path, self.path)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def get_repo_metadata_cache():
+    global _repo_metadata_cache
+    with _repo_metadata_cache_lock:
+        if _repo_metadata_cache is None:
+            _repo_metadata_cache = RepoMetadataCache()
+        return _repo_metadata_cache
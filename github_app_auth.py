@@ -1,8 +1,13 @@
+import asyncio
 import os
 import jwt
+import threading
 import time
 import requests
+from collections import Counter
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from github.rate_limiter import rate_limited_request
 
 # Load environment variables
 load_dotenv()
@@ -10,47 +15,159 @@ load_dotenv()
 GITHUB_APP_ID = os.getenv("GITHUB_APP_ID")
 GITHUB_APP_PRIVATE_KEY = os.getenv("GITHUB_APP_PRIVATE_KEY")
 GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")
+JWT_LIFETIME_SECONDS = 600  # GitHub rejects app JWTs valid for more than 10 minutes
+JWT_REFRESH_MARGIN_SECONDS = int(os.getenv("GITHUB_JWT_REFRESH_MARGIN_SECONDS", 60))
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("GITHUB_TOKEN_REFRESH_MARGIN_SECONDS", 300))
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
 
 def generate_jwt(app_id, private_key):
     # print(f"app_id: {app_id}")
     # print(f"private_key: {private_key}")
     payload = {
         "iat": int(time.time()),
-        "exp": int(time.time()) + 600,
+        "exp": int(time.time()) + JWT_LIFETIME_SECONDS,
         "iss": app_id
     }
     return jwt.encode(payload, private_key, algorithm="RS256")
 
-def get_installation_access_token(jwt, repository):
+def get_installation_id(jwt, repository):
     owner, repo = repository.split("/")
     headers = {
         "Authorization": f"Bearer {jwt}",
         "Accept": "application/vnd.github.v3+json"
     }
-    response = requests.get(
+    response = rate_limited_request(lambda: requests.get(
         f"https://api.github.com/repos/{owner}/{repo}/installation",
         headers=headers
-    )
+    ), jwt)
     response.raise_for_status()
-    installation_id = response.json()["id"]
+    return response.json()["id"]
 
-    response = requests.post(
+def create_installation_access_token(jwt, installation_id):
+    """
+    Mint an installation access token. Returns (token, expires_at) with
+    `expires_at` as a Unix timestamp.
+    """
+    headers = {
+        "Authorization": f"Bearer {jwt}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    response = rate_limited_request(lambda: requests.post(
         f"https://api.github.com/app/installations/{installation_id}/access_tokens",
         headers=headers
-    )
+    ), jwt)
     response.raise_for_status()
-    return response.json()["token"]
+    data = response.json()
+    expires_at = datetime.strptime(data["expires_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
+    return data["token"], expires_at
+
+def get_installation_access_token(jwt, repository):
+    installation_id = get_installation_id(jwt, repository)
+    token, _ = create_installation_access_token(jwt, installation_id)
+    return token
+
+def load_private_key(private_key=GITHUB_APP_PRIVATE_KEY):
+    # The variable holds either the PEM itself or the path of the key file
+    if private_key and os.path.isfile(private_key):
+        with open(private_key, "r") as key_file:
+            return key_file.read()
+    return private_key
+
+
+class InstallationTokenCache:
+    """
+    Thread-safe cache of the app JWT, of installation IDs per repository and of
+    access tokens per installation.
+
+    The JWT is re-signed shortly before its 10 minute lifetime ends and tokens
+    are minted again TOKEN_REFRESH_MARGIN_SECONDS before their one hour expiry.
+    Each key has its own lock, so concurrent jobs needing the same token wait
+    for a single mint instead of each minting one.
+    """
+
+    def __init__(self, app_id, private_key):
+        self.app_id = app_id
+        self.private_key = private_key
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.jwt = None
+        self.jwt_expires_at = 0
+        self.installation_ids = {}
+        self.tokens = {}
+        self.counters = Counter()
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get_jwt(self):
+        with self._key_lock("jwt"):
+            if self.jwt is None or time.time() >= self.jwt_expires_at - JWT_REFRESH_MARGIN_SECONDS:
+                issued_at = time.time()
+                self.jwt = generate_jwt(self.app_id, self.private_key)
+                self.jwt_expires_at = int(issued_at) + JWT_LIFETIME_SECONDS
+                self.counters["jwts_signed"] += 1
+            return self.jwt
+
+    def get_installation_id(self, repository):
+        with self._key_lock(("installation", repository)):
+            if repository not in self.installation_ids:
+                self.installation_ids[repository] = get_installation_id(self.get_jwt(), repository)
+                self.counters["installation_lookups"] += 1
+            return self.installation_ids[repository]
+
+    def get_token(self, repository):
+        installation_id = self.get_installation_id(repository)
+        with self._key_lock(("token", installation_id)):
+            cached = self.tokens.get(installation_id)
+            if cached and time.time() < cached[1] - TOKEN_REFRESH_MARGIN_SECONDS:
+                self.counters["hits"] += 1
+                return cached[0]
+            try:
+                self.tokens[installation_id] = create_installation_access_token(self.get_jwt(), installation_id)
+            except requests.HTTPError as e:
+                # The app may have been reinstalled under a new installation ID
+                if e.response is not None and e.response.status_code == 404:
+                    with self.lock:
+                        self.installation_ids.pop(repository, None)
+                raise
+            self.counters["tokens_minted"] += 1
+            return self.tokens[installation_id][0]
+
+    def stats(self):
+        return {**self.counters, "installations": len(self.installation_ids), "tokens": len(self.tokens)}
+
+
+def get_token_cache():
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            _token_cache = InstallationTokenCache(GITHUB_APP_ID, load_private_key())
+        return _token_cache
+
+def get_repository_access_token(repository):
+    """
+    Installation access token of the GitHub App for `repository` ("owner/name"),
+    served from the cache while it is still valid.
+    """
+    return get_token_cache().get_token(repository)
+
+async def get_repository_access_token_async(repository):
+    # The cache locks are thread locks, the lookup runs in a worker thread so the event loop is never blocked
+    return await asyncio.to_thread(get_repository_access_token, repository)
 
 def make_graphql_request(token, query):
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github.v3+json"
     }
-    response = requests.post(
+    response = rate_limited_request(lambda: requests.post(
         "https://api.github.com/graphql",
         json={"query": query},
         headers=headers
-    )
+    ), token)
     response.raise_for_status()
     return response.json()
 
@@ -0,0 +1,200 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from utils import CACHE_DIR
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = os.path.abspath(os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite3")))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+class LLMCache:
+    """
+    Disk-backed, content-addressed cache of LLM responses.
+
+    Entries are keyed by a hash of model + messages + response schema, expire
+    after a TTL and are evicted least-recently-used once the stored values
+    exceed `max_bytes`.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl_seconds=LLM_CACHE_TTL_SECONDS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, messages, response_format=None, options=None):
+        schema = response_format.model_json_schema() if response_format is not None else None
+        payload = json.dumps({"model": model, "messages": messages, "schema": schema, "options": options}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, size, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            value, size, expires_at = row
+            if expires_at <= now:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.counters["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        expires_at = now + (ttl_seconds or self.ttl_seconds)
+        with self.lock:
+            previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, size, now, expires_at, now),
+            )
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self.counters["writes"] += 1
+            self._evict()
+
+    def delete(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= row[0]
+                self.counters["invalidations"] += 1
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Expired entries go first, then the least recently used ones
+        expired = self.connection.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses WHERE expires_at <= ?", (time.time(),)).fetchone()
+        self.connection.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        self.total_bytes -= expired[0]
+        self.counters["expired"] += expired[1]
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            evicted = []
+            for key, size in rows:
+                evicted.append((key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+            self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self.counters["evictions"] += len(evicted)
+
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": entries,
+                "bytes": self.total_bytes,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def get_llm_cache():
+    """
+    Process-wide cache instance, or None when caching is disabled.
+    """
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
+
+
+def llm_cache_stats():
+    cache = get_llm_cache()
+    return cache.stats() if cache else {}
+
+
+async def cached_parse(client, model, messages, response_format, **kwargs):
+    """
+    Cached `client.beta.chat.completions.parse`, for both OpenAI and AsyncOpenAI clients.
+
+    Returns the parsed response_format instance.
+    """
+    cache = get_llm_cache()
+    key = LLMCache.make_key(model, messages, response_format, kwargs) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return response_format.model_validate_json(cached)
+
+    completion = client.beta.chat.completions.parse(model=model, messages=messages, response_format=response_format, **kwargs)
+    if inspect.isawaitable(completion):
+        completion = await completion
+    parsed = completion.choices[0].message.parsed
+
+    if cache and parsed is not None:
+        cache.set(key, parsed.model_dump_json())
+    return parsed
+
+
+async def cached_ainvoke(ai, messages, validate=None):
+    """
+    Cached `ChatOpenAI.ainvoke`. Returns the response content, or
+    `validate(content)` when `validate` is given.
+
+    `validate` raises on a reply the caller cannot use. Such a reply is not
+    stored, so the next run asks the model again instead of replaying the
+    failure for the whole TTL.
+    """
+    cache = get_llm_cache()
+    model = getattr(ai, "model_name", None)
+    serialized = [{"role": message.type, "content": message.content} for message in messages]
+    key = LLMCache.make_key(model, serialized, options={"temperature": getattr(ai, "temperature", None)}) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            try:
+                return validate(cached) if validate else cached
+            except Exception as e:
+                # Stored before replies were validated, drop it and ask again
+                print(f"Dropping invalid cached LLM response: {e}")
+                cache.delete(key)
+
+    ai_response = await ai.ainvoke(messages)
+    result = validate(ai_response.content) if validate else ai_response.content
+    if cache:
+        cache.set(key, ai_response.content)
+    return result
@@ -0,0 +1,18 @@
+import asyncio
+import weakref
+from openai import AsyncOpenAI
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client of the running event loop. Its pooled connections are
+    bound to the loop that opened them, so every asyncio.run (Streamlit
+    reruns, webhook worker threads) gets a client of its own.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOpenAI()
+    return client
@@ -0,0 +1,114 @@
+import os
+import re
+import subprocess
+import tempfile
+from test_reports import follow_jsonl_reports, plugin_environment
+
+PYTEST_WORKERS = int(os.getenv("PYTEST_WORKERS", os.cpu_count() or 4))
+PYTEST_SESSION_TIMEOUT = int(os.getenv("PYTEST_SESSION_TIMEOUT", 1800))  # Seconds for the whole run
+
+
+def xdist_available(python="python"):
+    return subprocess.run([python, "-c", "import xdist"], capture_output=True).returncode == 0
+
+
+def count_test_functions(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return max(1, len(re.findall(r"def\s+test_\w+", f.read())))
+    except OSError:
+        return 1
+
+
+def shard_test_files(test_files, workers):
+    """
+    Split the files into at most `workers` shards with about the same number
+    of tests each. Files stay whole so module fixtures run once.
+    """
+    shards = [[] for _ in range(max(1, min(workers, len(test_files))))]
+    sizes = [0] * len(shards)
+    weighted = sorted(((count_test_functions(path), path) for path in test_files), reverse=True)
+    for weight, path in weighted:
+        smallest = sizes.index(min(sizes))
+        shards[smallest].append(path)
+        sizes[smallest] += weight
+    return [shard for shard in shards if shard]
+
+
+def iter_pytest_session(test_files, python="python", workers=PYTEST_WORKERS):
+    """
+    Run every test file in one pytest run spread over `workers` processes and
+    yield (nodeid, result) as each test finishes, `result` holding its
+    outcome, duration and failure message.
+
+    With pytest-xdist installed this is a single `pytest -n` session. Otherwise
+    the files are sharded across worker pytest processes started side by side.
+    Either way each file is collected once.
+    """
+    test_files = list(test_files)
+    if not test_files:
+        return
+
+    # One broken generated file must not stop the other files of its session
+    base_command = [python, "-m", "pytest", "-q", "-p", "no:cacheprovider", "-p", "pytest_jsonl_plugin", "--continue-on-collection-errors"]
+    with tempfile.TemporaryDirectory(prefix="pytest-session-") as report_dir:
+        if workers > 1 and xdist_available(python):
+            shards = [test_files]
+            extra = ["-n", str(workers)]
+        else:
+            shards = shard_test_files(test_files, workers)
+            extra = []
+        print(f"Running {len(test_files)} test file(s) in {len(shards)} pytest process(es)")
+
+        processes = []
+        reports = []
+        logs = []
+        for index, shard in enumerate(shards):
+            report = os.path.join(report_dir, f"shard-{index}.jsonl")
+            # Console output goes to a file, a full pipe would stall the worker
+            log = open(os.path.join(report_dir, f"shard-{index}.log"), "w+")
+            env = plugin_environment(PYTEST_JSONL_REPORT=report)
+            processes.append(subprocess.Popen(base_command + extra + shard, stdout=log, stderr=subprocess.STDOUT, env=env))
+            reports.append(report)
+            logs.append(log)
+
+        try:
+            for record in follow_jsonl_reports(reports, processes, PYTEST_SESSION_TIMEOUT):
+                yield record["nodeid"], {"outcome": record["outcome"], "duration": record["duration"], "message": record["message"]}
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            for log in logs:
+                log.seek(0)
+                print(log.read())
+                log.close()
+
+
+def run_pytest_session(test_files, python="python", workers=PYTEST_WORKERS, on_result=None):
+    """
+    Run every test file in one parallel pytest run and return the per-test
+    results keyed by pytest node ID. `on_result(nodeid, result)` is called as
+    each test finishes. A test failing in teardown after passing is reported
+    as an error.
+    """
+    results = {}
+    for nodeid, result in iter_pytest_session(test_files, python, workers):
+        if nodeid in results:
+            result = dict(result, duration=results[nodeid]["duration"] + result["duration"])
+        results[nodeid] = result
+        if on_result:
+            on_result(nodeid, result)
+    return results
+
+
+def results_by_file(results):
+    """
+    Group per-test results by test file, as {file: {test name: result}}.
+    """
+    grouped = {}
+    for nodeid, result in results.items():
+        file_path, _, test_name = nodeid.partition("::")
+        grouped.setdefault(os.path.normpath(file_path), {})[test_name] = result
+    return grouped
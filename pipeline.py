@@ -0,0 +1,61 @@
+import asyncio
+import json
+from agents.agent_analyze_langs import analyze_repo_content
+from agents.agent_analyze_testing_files import analyze_repo_content_need_testing
+from artifact_store import generate_tests_incrementally
+from github.get_file_contents import get_file_contents
+from utils import format_file_sections
+from webhook_jobs import check_cancelled
+
+
+async def run_pipeline(content: str, tree=None, extracted_text: str = "", is_regression: bool = False, user_repo=None, cancel_event=None):
+    """
+    Run every agent over a gitingest-style `content` inside one event loop.
+
+    The tech stack is detected once for the whole content while the snippets
+    are extracted concurrently, then all snippets go through the batched test
+    case and test code generation together.
+
+    Returns a dict with the languages, the JSON outputs of each stage and,
+    under "errors", the chunks each analysis stage failed on.
+    """
+    check_cancelled(cancel_event)
+    errors = {"frameworks_and_languages": [], "modules_need_testing": []}
+    analysis_result_langs, analysis_result_testing = await asyncio.gather(
+        analyze_repo_content(content, tree, errors=errors["frameworks_and_languages"]),
+        analyze_repo_content_need_testing(content, tree, errors=errors["modules_need_testing"]),
+    )
+    check_cancelled(cancel_event)
+    print('==============================================================================================')
+    print(f"analysis_result_langs: {analysis_result_langs}")
+    print(f"modules_need_testing: {analysis_result_testing}")
+    print('==============================================================================================')
+
+    analysis_result_langs_json = json.dumps(analysis_result_langs, indent=4)
+    # Only functions whose source changed are sent to the test generation agents
+    test_cases, test_code = await generate_tests_incrementally(analysis_result_testing, analysis_result_langs_json, extracted_text, is_regression, tree, user_repo)
+    check_cancelled(cancel_event)
+
+    return {
+        "frameworks_and_languages": analysis_result_langs,
+        "modules_need_testing": analysis_result_testing,
+        "test_cases": test_cases,
+        "unit_tests": test_code,
+        "errors": errors,
+    }
+
+
+async def run_push_pipeline(repository: str, commit_oid: str, paths, token: str, cancel_event=None):
+    """
+    Fetch the changed `paths` of `repository` ("owner/name") at `commit_oid` and
+    run the regression pipeline over all of them at once.
+
+    Returns (files, results), `results` is None when no file could be read.
+    """
+    repo_owner, repo_name = repository.split("/")
+    files = await get_file_contents(repo_owner, repo_name, commit_oid, paths, token)
+    print(f"Fetched {len(files)} of {len(paths)} changed file(s)")
+    if not files:
+        return files, None
+    results = await run_pipeline(format_file_sections(files), is_regression=True, cancel_event=cancel_event)
+    return files, results
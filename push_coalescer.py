@@ -0,0 +1,171 @@
+import copy
+import os
+import threading
+
+PUSH_QUIET_WINDOW_SECONDS = float(os.getenv("PUSH_QUIET_WINDOW_SECONDS", 10))
+
+
+def merge_path_status(previous, current):
+    """
+    Combine two successive changes of the same path into their net effect.
+    Returns None when the path ends up unchanged (added, then removed).
+    """
+    if previous is None:
+        return current
+    if previous == "added":
+        return None if current == "removed" else "added"
+    if previous == "removed":
+        return "removed" if current == "removed" else "modified"
+    return current
+
+
+def collect_push_paths(payload, paths=None):
+    """
+    Fold the added/removed/modified lists of a push payload's commits, in
+    order, into a {path: status} dict.
+    """
+    paths = {} if paths is None else paths
+    for commit in payload.get('commits', []):
+        for status in ('added', 'removed', 'modified'):
+            for path in commit.get(status, []):
+                merged = merge_path_status(paths.get(path), status)
+                if merged is None:
+                    paths.pop(path, None)
+                else:
+                    paths[path] = merged
+    return paths
+
+
+def order_pushes(pushes):
+    """
+    Sort (delivery_id, payload) pairs of one branch oldest first by following
+    the before -> after chain of the payloads, whatever order GitHub delivered
+    them in. Pushes outside the chain keep their arrival order at the end.
+    """
+    afters = {payload.get('after') for _, payload in pushes}
+    by_before = {}
+    for push in pushes:
+        by_before.setdefault(push[1].get('before'), push)
+    ordered = []
+    seen = set()
+    for push in pushes:
+        if push[1].get('before') in afters:
+            continue
+        # Walk the chain from a push no other push leads to
+        while push is not None and push[0] not in seen:
+            ordered.append(push)
+            seen.add(push[0])
+            push = by_before.get(push[1].get('after'))
+    ordered.extend(push for push in pushes if push[0] not in seen)
+    return ordered
+
+
+class PushCoalescer:
+    """
+    Debounces pushes per repository + ref.
+
+    Pushes to the same branch within `quiet_window` seconds of each other are
+    merged into one job for the latest head, with the union of their changed
+    paths. A new push also cancels the job already running for that branch
+    and folds its paths into the next one.
+    """
+
+    def __init__(self, job_queue, handler, quiet_window=PUSH_QUIET_WINDOW_SECONDS):
+        self.job_queue = job_queue
+        self.handler = handler
+        self.quiet_window = quiet_window
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.in_flight = {}
+
+    @staticmethod
+    def key(payload):
+        return payload.get('repository', {}).get('full_name'), payload.get('ref')
+
+    def submit(self, delivery_id, payload):
+        key = self.key(payload)
+        # A redelivery of a push already queued, run or merged changes nothing,
+        # one that failed is run again like WebhookJobQueue.submit does
+        known = self.job_queue.status(delivery_id) or self.status(delivery_id)
+        if known and known["status"] != "failed":
+            print(f"Delivery {delivery_id} already {known['status']}, ignoring redelivery")
+            return known
+
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = {"paths": {}, "pushes": [], "before": None, "timer": None}
+                running = self.in_flight.get(key)
+                if running and not running["cancel_event"].is_set():
+                    # The running job is superseded, its paths still need to be processed
+                    print(f"Cancelling in-flight job for {key}, superseded by {delivery_id}")
+                    running["cancel_event"].set()
+                    entry["paths"] = dict(running["paths"])
+                    entry["before"] = running["before"]
+                self.pending[key] = entry
+            elif entry["timer"]:
+                entry["timer"].cancel()
+
+            entry["pushes"].append((delivery_id, payload))
+            entry["timer"] = threading.Timer(self.quiet_window, self._flush, args=(key,))
+            entry["timer"].daemon = True
+            entry["timer"].start()
+            return {"delivery_id": delivery_id, "status": "pending", "pushes": len(entry["pushes"])}
+
+    def status(self, delivery_id):
+        with self.lock:
+            for key, entry in self.pending.items():
+                if any(pending_id == delivery_id for pending_id, _ in entry["pushes"]):
+                    return {"delivery_id": delivery_id, "status": "pending", "repository": key[0], "ref": key[1]}
+        return None
+
+    def flush_all(self):
+        """
+        Dispatch every pending branch now, used on shutdown.
+        """
+        with self.lock:
+            keys = list(self.pending)
+            for key in keys:
+                if self.pending[key]["timer"]:
+                    self.pending[key]["timer"].cancel()
+        for key in keys:
+            self._flush(key)
+
+    def _flush(self, key):
+        with self.lock:
+            entry = self.pending.pop(key, None)
+            if entry is None:
+                return
+            # Paths are folded oldest push first, the job runs for the newest head
+            pushes = order_pushes(entry["pushes"])
+            paths = entry["paths"]
+            for _, push_payload in pushes:
+                collect_push_paths(push_payload, paths)
+            before = entry["before"] or pushes[0][1].get('before')
+            cancel_event = threading.Event()
+            self.in_flight[key] = {"cancel_event": cancel_event, "paths": paths, "before": before}
+
+        payload = copy.copy(pushes[-1][1])
+        payload['before'] = before
+        payload['commits'] = [{
+            'id': payload.get('after'),
+            'message': f"Coalesced {len(pushes)} push(es)",
+            'added': sorted(path for path, status in paths.items() if status == 'added'),
+            'removed': sorted(path for path, status in paths.items() if status == 'removed'),
+            'modified': sorted(path for path, status in paths.items() if status == 'modified'),
+        }]
+        delivery_id = pushes[-1][0]
+        merged_ids = [push_id for push_id, _ in pushes[:-1]]
+        print(f"Dispatching {delivery_id} for {key} with {len(paths)} changed path(s), merged {merged_ids}")
+
+        def run(job_payload, event_type):
+            try:
+                self.handler(job_payload, event_type, cancel_event=cancel_event)
+            finally:
+                with self.lock:
+                    if self.in_flight.get(key, {}).get("cancel_event") is cancel_event:
+                        del self.in_flight[key]
+
+        for merged_id in merged_ids:
+            self.job_queue.record(merged_id, 'push', "coalesced", coalesced_into=delivery_id)
+        self.job_queue.submit(delivery_id, payload, 'push', handler=run)
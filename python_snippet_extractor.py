@@ -0,0 +1,73 @@
+import ast
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from models.module_method_model import CodeSnippet
+
+EXTRACTOR_WORKERS = int(os.getenv("EXTRACTOR_WORKERS", os.cpu_count() or 4))
+# Below this many files the process pool start-up costs more than it saves
+PARALLEL_FILES_THRESHOLD = 32
+
+
+def extract_python_snippets(path: str, source: str):
+    """
+    List the top-level functions and classes of a Python file as CodeSnippet records.
+
+    Methods stay inside their class snippet, nested functions are skipped. Raises
+    SyntaxError when the file cannot be parsed.
+    """
+    tree = ast.parse(source, filename=path)
+    lines = source.splitlines(keepends=True)
+    snippets = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            snippet_type = "function"
+        elif isinstance(node, ast.ClassDef):
+            snippet_type = "class"
+        else:
+            continue
+
+        # Decorators belong to the definition
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        code = "".join(lines[start - 1:node.end_lineno]).rstrip()
+        snippets.append(CodeSnippet(
+            id=str(uuid.uuid4()),
+            path=path,
+            name=node.name,
+            type=snippet_type,
+            code=code,
+        ))
+    return snippets
+
+
+def _extract_file(item):
+    path, source = item
+    try:
+        return path, extract_python_snippets(path, source), None
+    except (SyntaxError, ValueError) as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+def extract_python_files(files):
+    """
+    Extract snippets from many (path, source) pairs, in parallel for large batches.
+
+    Returns (snippets, failed) where failed maps each unparsable path to its
+    error so the caller can hand those files to the LLM instead.
+    """
+    files = list(files)
+    if len(files) < PARALLEL_FILES_THRESHOLD:
+        results = map(_extract_file, files)
+    else:
+        with ProcessPoolExecutor(max_workers=EXTRACTOR_WORKERS) as executor:
+            chunksize = max(1, len(files) // (EXTRACTOR_WORKERS * 4))
+            results = list(executor.map(_extract_file, files, chunksize=chunksize))
+
+    snippets = []
+    failed = {}
+    for path, file_snippets, error in results:
+        if error:
+            print(f"Could not parse {path}, falling back to the LLM: {error}")
+            failed[path] = error
+        snippets.extend(file_snippets)
+    return snippets, failed
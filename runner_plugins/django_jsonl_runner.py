@@ -0,0 +1,65 @@
+"""
+Django test runner writing one JSON line per finished test to $DJANGO_JSONL_REPORT.
+
+Used with `manage.py test --testrunner=django_jsonl_runner.JSONLinesTestRunner`
+in the tested project, the agent reads the file while the tests are running.
+"""
+import json
+import os
+import time
+import unittest
+from django.test.runner import DiscoverRunner
+
+
+class JSONLinesTestResult(unittest.TextTestResult):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.report_file = open(os.environ["DJANGO_JSONL_REPORT"], "a", encoding="utf-8", buffering=1)
+        self.started_at = {}
+
+    def startTest(self, test):
+        self.started_at[test.id()] = time.perf_counter()
+        super().startTest(test)
+
+    def _write(self, test, outcome, message=None):
+        started_at = self.started_at.pop(test.id(), None)
+        duration = time.perf_counter() - started_at if started_at is not None else 0.0
+        self.report_file.write(json.dumps({"nodeid": test.id(), "outcome": outcome, "duration": duration, "message": message}) + "\n")
+
+    @staticmethod
+    def _error_message(err):
+        exc_type, exc_value, _ = err
+        return f"{exc_type.__name__}: {exc_value}"
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._write(test, "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._write(test, "failed", self._error_message(err))
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._write(test, "error", self._error_message(err))
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._write(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._write(test, "xfailed", self._error_message(err))
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._write(test, "xpassed")
+
+    def stopTestRun(self):
+        super().stopTestRun()
+        self.report_file.close()
+
+
+class JSONLinesTestRunner(DiscoverRunner):
+    def get_resultclass(self):
+        return JSONLinesTestResult
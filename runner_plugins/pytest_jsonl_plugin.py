@@ -0,0 +1,61 @@
+"""
+pytest plugin writing one JSON line per finished test to $PYTEST_JSONL_REPORT.
+
+Loaded into the tested repository's pytest with `-p pytest_jsonl_plugin`, the
+agent reads the file while the session is still running.
+"""
+import json
+import os
+
+_report_file = None
+_is_xdist_worker = False
+
+
+def _write(record):
+    global _report_file
+    if _report_file is None:
+        _report_file = open(os.environ["PYTEST_JSONL_REPORT"], "a", encoding="utf-8", buffering=1)
+    _report_file.write(json.dumps(record) + "\n")
+
+
+def _message(report):
+    if report.passed:
+        return None
+    if report.skipped and isinstance(report.longrepr, tuple):
+        return report.longrepr[2]
+    crash = getattr(report.longrepr, "reprcrash", None)
+    return crash.message if crash is not None else report.longreprtext
+
+
+def pytest_configure(config):
+    global _is_xdist_worker
+    # Under xdist the controller receives every worker's reports, only it writes
+    _is_xdist_worker = hasattr(config, "workerinput")
+
+
+def pytest_collectreport(report):
+    if _is_xdist_worker:
+        return
+    if report.failed:
+        _write({"nodeid": report.nodeid, "outcome": "error", "when": "collect", "duration": 0.0, "message": report.longreprtext})
+
+
+def pytest_runtest_logreport(report):
+    if _is_xdist_worker:
+        return
+    if report.when == "call" or (report.when == "setup" and not report.passed):
+        outcome = report.outcome
+        if report.when == "setup" and report.failed:
+            outcome = "error"
+        elif hasattr(report, "wasxfail"):
+            outcome = "xfailed" if report.skipped else "xpassed"
+    elif report.when == "teardown" and report.failed:
+        outcome = "error"
+    else:
+        return
+    _write({"nodeid": report.nodeid, "outcome": outcome, "when": report.when, "duration": report.duration, "message": _message(report)})
+
+
+def pytest_unconfigure(config):
+    if _report_file is not None:
+        _report_file.close()
@@ -1,5 +1,6 @@
 import asyncio
-import base64
+import atexit
+import uuid
 from flask import Flask, json, request, jsonify
 import threading
 import requests
@@ -8,18 +9,20 @@ from gitingest import ingest
 from dotenv import load_dotenv
 import os
 from add_test_interperator import run_test
-from agents.agent_analyze_langs import analyze_repo_content
-from agents.agent_analyze_testing_files import analyze_repo_content_need_testing
-from agents.agent_generate_test_cases import generate_test_cases
-from agents.agent_generate_test_code import generate_unit_testing_code
+from pipeline import run_pipeline, run_push_pipeline
+from webhook_jobs import JobCancelled, WebhookJobQueue, check_cancelled
+from push_coalescer import PushCoalescer
 import pdfplumber
 from langchain_community.chat_message_histories import (
     StreamlitChatMessageHistory,
 )
 import re
 
-from github_app_auth import generate_jwt, get_installation_access_token
+from github.rate_limiter import BACKFILL, get_rate_limiter, request_priority
+from github.repo_metadata_cache import get_repo_metadata_cache
+from github_app_auth import generate_jwt, get_installation_access_token, get_repository_access_token
 from utils import get_repo_name
+from venv_pool import get_venv_pool
 import socket
 from contextlib import closing
 load_dotenv()
@@ -35,19 +38,16 @@ if hasattr(asyncio, "WindowsProactorEventLoopPolicy"):
 app = Flask(__name__)
 webhook_event_received = False
 
-def handle_webhook_delivery(payload, event_type):
+def handle_webhook_delivery(payload, event_type, cancel_event=None):
     """
     Handles GitHub webhook deliveries for push and pull_request events.
+    Stops between stages once `cancel_event` is set by a newer push.
     """
     global webhook_event_received  # Access the global variable
     webhook_event_received = True
     
     # print(f"payload: {payload}")
     print("===========================================================================================")
-    # 'contents_url': 'https://api.github.com/repos/mariamkhaled99/ABI-Backend-Assesment/contents/{+path}'
-    # Get the contents_url template
-    content_url = payload.get('repository', {}).get('contents_url')
-
     # Initialize lists to store added, removed, and modified files
     added_files = []
     removed_files = []
@@ -68,72 +68,42 @@ def handle_webhook_delivery(payload, event_type):
         'modified': modified_files
     }
     
-    print(f"content_url: {content_url}")   
-    print("===========================================================================================")
- 
     print(f"paths: {paths}")
     repository = payload.get('repository', {}).get('full_name')
     repo_url = f"https://github.com/{repository}"
 
 
     if event_type == 'push':
-        analysis_result_testing = []
-        test_cases = []
-        test_code=[]
-
         # Handle push event
         branch = payload.get('ref').split('/')[-1]  # Extract branch name
         commits = payload.get('commits', [])
         print(f"Push event received for branch: {branch}")
         print(f"Number of commits: {len(commits)}")
 
-        # Loop over each category (added, removed, modified)
-        for category, file_paths in paths.items():
-            if file_paths:  # Check if the list is not empty
-                print(f"Processing {category} files:")
-                for file_path in file_paths:
-                    # Replace {+path} in the contents_url with the file path
-                    content_url = content_url.replace('{+path}', file_path)
-                    print(f"Fetching content from: {content_url}")
-
-                    # Make a GET request to fetch the file content
-                    response = requests.get(content_url)
-                    if response.status_code == 200:
-                        file_data = response.json()
-                        file_name = file_data.get('name')
-                        file_content_encoded = file_data.get('content')
-                        file_content_decoded = base64.b64decode(file_content_encoded).decode('utf-8')
-
-                        print(f"File: {file_name}")
-                        print("===========================================================================================")
-                        print(f"Decoded Content:\n{file_content_decoded}")
-                        content = file_content_decoded
-
-                        # Perform analysis on the content
-                        try:
-                            analysis_result_langs = asyncio.run(analyze_repo_content(content))
-                            analysis_result_testing_json = asyncio.run(analyze_repo_content_need_testing(content))
-                            print('==============================================================================================')
-                            print(f"analysis_result_langs before json: {analysis_result_langs}")
-                            print('==============================================================================================')
-                            print('==============================================================================================')
-                            print(f"modules_need_testing: {analysis_result_testing_json}")
-                            print('==============================================================================================')
-                            analysis_result_langs_json = json.dumps(analysis_result_langs, indent=4)
-                            print(f"analysis_result_langs: {analysis_result_langs_json}")
-                            print('==============================================================================================')
-
-                            test_cases_json = asyncio.run(generate_test_cases(analysis_result_testing_json, analysis_result_langs_json, "", True))
-                            test_code_json=asyncio.run(generate_unit_testing_code(test_cases_json,analysis_result_langs_json,True))
-                            print(f"unit tests:{test_code_json}")
-                            print('==============================================================================================')
-                            
-                            
-
-
-                        except Exception as e:
-                            print(f"An error occurred during analysis: {e}")
-                            continue
+        # Removed files cannot be fetched, the rest is read at the pushed head in batched queries
+        changed_paths = [path for path in added_files + modified_files if path not in removed_files]
+        check_cancelled(cancel_event)
+        github_token = get_repository_access_token(repository)
+
+        # Fetching, analysis and generation for the whole push run in one event loop
+        analysis_result_langs = {"languages": [], "frameworks": []}
+        analysis_result_testing_json = json.dumps([])
+        test_cases_json = test_code_json = json.dumps([])
+        try:
+            files, pipeline_results = asyncio.run(run_push_pipeline(repository, payload.get('after'), changed_paths, github_token, cancel_event))
+            if pipeline_results:
+                analysis_result_langs = pipeline_results["frameworks_and_languages"]
+                analysis_result_testing_json = pipeline_results["modules_need_testing"]
+                test_cases_json = pipeline_results["test_cases"]
+                test_code_json = pipeline_results["unit_tests"]
+                if any(pipeline_results["errors"].values()):
+                    print(f"Analysis failed on some chunks: {pipeline_results['errors']}")
+                print(f"unit tests:{test_code_json}")
+                print('==============================================================================================')
+        except JobCancelled:
+            raise
+        except Exception as e:
+            print(f"An error occurred during analysis: {e}")
 
         # Create a dictionary with the results
         result_data = {
@@ -170,6 +140,7 @@ def handle_webhook_delivery(payload, event_type):
         
         repo_name=repo_name = get_repo_name(repo_url)
         
+        check_cancelled(cancel_event)
         run_test(repo_url,repo_name,test_code_json,languages)
 
         # # You can also save it to a file if needed
@@ -195,22 +166,72 @@ def handle_webhook_delivery(payload, event_type):
     # else:
     #     print(f"Ignoring unhandled event type: {event_type}")
 
+def run_webhook_job(payload, event_type, cancel_event=None):
+    # Webhook work is backfill, interactive analyses sharing a token get the GitHub budget first
+    with request_priority(BACKFILL):
+        handle_webhook_delivery(payload, event_type, cancel_event=cancel_event)
+
+@st.cache_resource
+def get_webhook_jobs():
+    """
+    Job queue and push coalescer of the process. Streamlit re-runs this script
+    on every interaction, the worker threads and exit hooks are created once.
+    """
+    # Deliveries are processed in the background so GitHub gets its 202 right away
+    job_queue = WebhookJobQueue(run_webhook_job)
+    # Bursts of pushes to one branch are merged into a single job for the latest head
+    push_coalescer = PushCoalescer(job_queue, run_webhook_job)
+    atexit.register(job_queue.shutdown)
+    atexit.register(push_coalescer.flush_all)
+    return job_queue, push_coalescer
+
+
+job_queue, push_coalescer = get_webhook_jobs()
+
 # Register the /webhook route
 @app.route('/webhook', methods=['POST'])
 def webhook():
-    # Respond to indicate that the delivery was successfully received
-    response = jsonify({'status': 'Accepted'})
-    response.status_code = 202
-
     # Check the `x-github-event` header to learn what event type was sent
     github_event = request.headers.get('X-GitHub-Event')
+    delivery_id = request.headers.get('X-GitHub-Delivery') or str(uuid.uuid4())
 
-    # Handle the webhook delivery
-    handle_webhook_delivery(request.json, github_event)
+    # Queue the webhook delivery
+    if github_event == 'push':
+        # Branch heads are refreshed from the payload so later lookups need no query
+        get_repo_metadata_cache().update_from_push_payload(request.json)
+        job = push_coalescer.submit(delivery_id, request.json)
+    else:
+        job = job_queue.submit(delivery_id, request.json, github_event)
 
+    # Respond to indicate that the delivery was successfully received
+    response = jsonify({'status': 'Accepted', 'delivery_id': delivery_id, 'job_status': job['status']})
+    response.status_code = 202
     return response
 
 
+@app.route('/webhook/jobs/<delivery_id>', methods=['GET'])
+def webhook_job_status(delivery_id):
+    job = push_coalescer.status(delivery_id) or job_queue.status(delivery_id)
+    if job is None:
+        return jsonify({'error': f'Unknown delivery: {delivery_id}'}), 404
+    return jsonify(job)
+
+
+@app.route('/webhook/stats', methods=['GET'])
+def webhook_stats():
+    return jsonify({
+        'jobs': job_queue.stats(),
+        'repo_metadata_cache': get_repo_metadata_cache().stats(),
+        'venv_pool': get_venv_pool().stats(),
+    })
+
+
+@app.route('/github/rate-limit', methods=['GET'])
+def github_rate_limit():
+    # Live per-token budget, what is queued behind it and how often we were throttled
+    return jsonify(get_rate_limiter().snapshot())
+
+
 
 def find_free_port():
     with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as s:
@@ -226,10 +247,16 @@ def run_webhook_server():
     """Run the Flask webhook server on port 3000."""
     app.run(host='0.0.0.0', port=port)  # Listen on all network interfaces
 
-# Start the webhook server in a separate thread
-webhook_thread = threading.Thread(target=run_webhook_server)
-webhook_thread.daemon = True  # Daemonize thread to stop it when the main program exits
-webhook_thread.start()
+@st.cache_resource
+def start_webhook_server():
+    # Start the webhook server in a separate thread, once per process rather than on every rerun
+    webhook_thread = threading.Thread(target=run_webhook_server)
+    webhook_thread.daemon = True  # Daemonize thread to stop it when the main program exits
+    webhook_thread.start()
+    return webhook_thread
+
+
+webhook_thread = start_webhook_server()
 
 
 # Title of the app
@@ -313,27 +340,15 @@ if st.button("Analyze Repository"):
             
             
 
-            # Perform analysis on the content
-            analysis_result_langs = asyncio.run(analyze_repo_content(content))
-            analysis_result_testing = asyncio.run(analyze_repo_content_need_testing(content))
-            print('==============================================================================================')
-            print(f"analysis_result_langs before json: {analysis_result_langs}")
-            print('==============================================================================================')
-            print('==============================================================================================')
-            
-            # modules_need_testing_json=json.dumps(analysis_result_testing, indent=4)
-            print('==============================================================================================')
-            print(f"modules_need_testing: {analysis_result_testing}")
-            print('==============================================================================================')
-            analysis_result_langs_json=json.dumps(analysis_result_langs, indent=4)
-            print(f"analysis_result_langs: {analysis_result_langs_json}")
-            print('==============================================================================================')
-            
-
-
-            test_cases= asyncio.run(generate_test_cases(analysis_result_testing,analysis_result_langs_json,extracted_text,False))
-            
-            test_code=asyncio.run(generate_unit_testing_code(test_cases,analysis_result_langs_json,False,new_tree,user_repo))
+            # Perform analysis on the content, every stage in one event loop
+            pipeline_results = asyncio.run(run_pipeline(content, new_tree, extracted_text, False, user_repo))
+            analysis_result_langs = pipeline_results["frameworks_and_languages"]
+            analysis_result_testing = pipeline_results["modules_need_testing"]
+            test_cases = pipeline_results["test_cases"]
+            test_code = pipeline_results["unit_tests"]
+            failed_chunks = sum(len(stage_errors) for stage_errors in pipeline_results["errors"].values())
+            if failed_chunks:
+                st.warning(f"{failed_chunks} chunk(s) could not be analysed, the results may be incomplete: {pipeline_results['errors']}")
             
             # Create a dictionary with the results
             result_data = {
@@ -0,0 +1,158 @@
+import json
+import os
+import re
+from collections import Counter
+from utils import iter_files
+
+# Confidence at or above which the LLM language pass is skipped
+STATIC_DETECTION_MIN_CONFIDENCE = float(os.getenv("STATIC_DETECTION_MIN_CONFIDENCE", 0.7))
+
+EXTENSION_LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".jsx": "JavaScript",
+    ".mjs": "JavaScript",
+    ".cjs": "JavaScript",
+    ".ts": "TypeScript",
+    ".tsx": "TypeScript",
+    ".java": "Java",
+    ".kt": "Kotlin",
+    ".rb": "Ruby",
+    ".php": "PHP",
+    ".cpp": "C++",
+    ".cc": "C++",
+    ".hpp": "C++",
+    ".h": "C++",
+    ".c": "C",
+    ".cs": "C#",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".swift": "Swift",
+    ".scala": "Scala",
+}
+
+# Files that never tell us anything about the stack
+IGNORED_EXTENSIONS = {
+    ".md", ".rst", ".txt", ".json", ".yml", ".yaml", ".toml", ".cfg", ".ini", ".lock",
+    ".html", ".htm", ".css", ".scss", ".sass", ".less", ".xml", ".svg", ".png", ".jpg",
+    ".jpeg", ".gif", ".ico", ".csv", ".env", ".sh", ".bat", ".ps1", ".sql", ".pdf",
+    ".gitignore", ".dockerignore", ".editorconfig", ".log", ".map", ".mod", ".sum", ".gradle",
+}
+
+MANIFEST_LANGUAGES = {
+    "requirements.txt": "Python",
+    "pipfile": "Python",
+    "pyproject.toml": "Python",
+    "setup.py": "Python",
+    "manage.py": "Python",
+    "package.json": "JavaScript",
+    "tsconfig.json": "TypeScript",
+    "pom.xml": "Java",
+    "build.gradle": "Java",
+    "gemfile": "Ruby",
+    "composer.json": "PHP",
+    "go.mod": "Go",
+    "cargo.toml": "Rust",
+}
+
+# Dependency names, matched case-insensitively against manifest contents
+PYTHON_FRAMEWORKS = {"django": "Django", "flask": "Flask", "fastapi": "FastAPI", "streamlit": "Streamlit"}
+JS_FRAMEWORKS = {
+    "react": "React",
+    "@angular/core": "Angular",
+    "vue": "Vue.js",
+    "next": "Next.js",
+    "express": "Express",
+    "@nestjs/core": "NestJS",
+}
+MANIFEST_FRAMEWORK_PATTERNS = {
+    "pom.xml": [(r"spring-boot|springframework", "Spring")],
+    "build.gradle": [(r"spring-boot|springframework", "Spring")],
+    "gemfile": [(r"""gem\s+['"]rails['"]""", "Rails")],
+    "composer.json": [(r"laravel/framework", "Laravel"), (r"symfony/", "Symfony")],
+}
+PYTHON_IMPORT_PATTERN = re.compile(r"^\s*(?:from|import)\s+(django|flask|fastapi|streamlit)\b", re.MULTILINE)
+TREE_ENTRY_PATTERN = re.compile(r"(?:├──|└──)\s+(.+?)/?\s*$", re.MULTILINE)
+
+
+def _python_requirement_names(text):
+    names = set()
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            names.add(re.split(r"[\s<>=!~\[;@]", line, 1)[0].lower())
+    return names
+
+
+def _detect_manifest_frameworks(file_name, body, frameworks):
+    if file_name == "requirements.txt":
+        names = _python_requirement_names(body)
+        frameworks.update(name for key, name in PYTHON_FRAMEWORKS.items() if key in names)
+    elif file_name in ("pipfile", "pyproject.toml", "setup.py"):
+        lowered = body.lower()
+        frameworks.update(name for key, name in PYTHON_FRAMEWORKS.items() if re.search(rf"['\"\s]{key}\b", lowered))
+    elif file_name == "package.json":
+        try:
+            package = json.loads(body)
+        except ValueError:
+            return
+        dependencies = {**package.get("dependencies", {}), **package.get("devDependencies", {})}
+        frameworks.update(name for key, name in JS_FRAMEWORKS.items() if key in dependencies)
+    for pattern, name in MANIFEST_FRAMEWORK_PATTERNS.get(file_name, []):
+        if re.search(pattern, body, re.IGNORECASE):
+            frameworks.add(name)
+
+
+def detect_techstack(content: str, tree: str = None):
+    """
+    Detect languages and frameworks from file names, manifests and imports.
+
+    Returns a tuple of the {"languages", "frameworks"} dict (the TechstackModel
+    shape) and a confidence between 0 and 1. Confidence is high when the code
+    files are recognised and every detected language is backed by a manifest.
+    """
+    language_files = Counter()
+    manifest_languages = set()
+    frameworks = set()
+    unknown_files = 0
+
+    file_names = [(path, body) for path, body in iter_files(content)]
+    if tree:
+        # The tree also lists files whose content gitingest skipped
+        seen = {os.path.basename(path) for path, _ in file_names}
+        file_names.extend((name, "") for name in TREE_ENTRY_PATTERN.findall(tree) if name not in seen)
+
+    for path, body in file_names:
+        base_name = os.path.basename(path).lower()
+        extension = os.path.splitext(base_name)[1]
+
+        if base_name in MANIFEST_LANGUAGES:
+            manifest_languages.add(MANIFEST_LANGUAGES[base_name])
+            _detect_manifest_frameworks(base_name, body, frameworks)
+        if base_name == "manage.py":
+            frameworks.add("Django")
+
+        if extension in EXTENSION_LANGUAGES:
+            language_files[EXTENSION_LANGUAGES[extension]] += 1
+            if extension == ".py" and body:
+                frameworks.update(PYTHON_FRAMEWORKS[name] for name in PYTHON_IMPORT_PATTERN.findall(body))
+        elif extension and extension not in IGNORED_EXTENSIONS and base_name not in MANIFEST_LANGUAGES:
+            unknown_files += 1
+
+    languages = set(language_files) | manifest_languages
+    if "TypeScript" in languages and not language_files.get("JavaScript"):
+        # package.json alone does not make a TypeScript project a JavaScript one
+        languages.discard("JavaScript")
+
+    result = {"languages": sorted(languages), "frameworks": sorted(frameworks)}
+
+    if not languages:
+        return result, 0.0
+
+    code_files = sum(language_files.values())
+    confidence = 0.5 if code_files else 0.3
+    if set(language_files) <= manifest_languages:
+        confidence += 0.3
+    if unknown_files <= 0.1 * max(code_files, 1):
+        confidence += 0.2
+    return result, round(confidence, 2)
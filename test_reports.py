@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+# Directory holding the pytest plugin and the Django runner loaded into the tested projects
+RUNNER_PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runner_plugins")
+REPORT_POLL_SECONDS = 0.1
+
+
+def plugin_environment(**variables):
+    """
+    Environment for a test process: the runner plugins importable, plus `variables`.
+    """
+    env = dict(os.environ, **variables)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [RUNNER_PLUGINS_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def follow_jsonl_reports(paths, processes, timeout=None):
+    """
+    Yield the records appended to the JSON-lines `paths` as they are written,
+    until every process in `processes` has exited and the files are drained.
+
+    Processes still running after `timeout` seconds are killed.
+    """
+    offsets = {path: 0 for path in paths}
+    partial = {path: "" for path in paths}
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        running = any(process.poll() is None for process in processes)
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as report:
+                report.seek(offsets[path])
+                chunk = report.read()
+                offsets[path] = report.tell()
+            lines = (partial[path] + chunk).split("\n")
+            # The last piece is an unfinished line unless the chunk ended on a newline
+            partial[path] = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+        if not running:
+            return
+        if deadline and time.monotonic() > deadline:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+            print(f"Test run timed out after {timeout}s")
+            deadline = None
+        time.sleep(REPORT_POLL_SECONDS)
@@ -0,0 +1,74 @@
+import asyncio
+import base64
+import functools
+import io
+
+import pytest
+
+from github import commit_planner, update_file
+from github.convert_files_before_commited import convert_data
+
+
+class TrackedFile(io.BytesIO):
+    """File-like source that records when the encoder reads it."""
+
+    def __init__(self, name, content, events):
+        super().__init__(content)
+        self.name = name
+        self.events = events
+
+    def read(self, size=-1):
+        if self.tell() == 0:
+            self.events.append(("read", self.name))
+        return super().read(size)
+
+
+def tracked_items(events, count=4):
+    items = []
+    for index in range(count):
+        name = f"src/file_{index}.py"
+        items.append({"file_path": name, "file_source": TrackedFile(name, f"value = {index}\n".encode("utf-8"), events)})
+    return items
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    events = []
+
+    async def fake_commit_batch(token, repo_owner, repo_name, branch_name, additions, headline, expected_head_oid):
+        events.append(("commit", [addition["path"] for addition in additions]))
+        return f"oid-{len([event for event in events if event[0] == 'commit'])}"
+
+    monkeypatch.setattr(commit_planner, "commit_batch", fake_commit_batch)
+    # One file per commit
+    monkeypatch.setattr(update_file, "commit_in_batches", functools.partial(commit_planner.commit_in_batches, max_files=1))
+    return events
+
+
+def test_update_files_encodes_each_file_as_its_commit_is_planned(commits):
+    oid = asyncio.run(update_file.update_files_on_github("token", "owner", "repo", "main", convert_data(tracked_items(commits)), "head"))
+
+    assert oid == "oid-4"
+    assert [event for event in commits if event[0] == "commit"] == [("commit", [f"src/file_{index}.py"]) for index in range(4)]
+    # Files are read a couple of batches ahead at most, not all before the first commit
+    assert commits.index(("read", "src/file_3.py")) > commits.index(("commit", ["src/file_0.py"]))
+
+
+def test_convert_data_is_reiterable(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("print('hello')\n")
+    files = convert_data([{"file_path": "module.py", "file_source": str(source)}, {"file_path": "inline.py", "file_code": "x = 1\n"}])
+
+    expected = [
+        ("module.py", base64.b64encode(b"print('hello')\n").decode("ascii")),
+        ("inline.py", base64.b64encode(b"x = 1\n").decode("ascii")),
+    ]
+    assert list(files) == expected
+    assert list(files) == expected
+
+
+def test_commit_in_batches_rejects_one_shot_iterators(commits):
+    additions = iter([("a.py", "YQ==")])
+    with pytest.raises(TypeError):
+        asyncio.run(commit_planner.commit_in_batches("token", "owner", "repo", "main", additions, "Update files", "head"))
+    assert commits == []
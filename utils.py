@@ -1,46 +1,200 @@
+import asyncio
+import os
 import re
-from tiktoken import encoding_for_model
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from tiktoken import encoding_for_model, get_encoding
 from urllib.parse import urlparse
+
+DEFAULT_TOKENIZER_MODEL = "gpt-3.5-turbo"
+TOKENIZER_WORKERS = int(os.getenv("TOKENIZER_WORKERS", os.cpu_count() or 4))
+# Below this many texts a batch is encoded inline, the pool overhead is not worth it
+BATCH_PARALLEL_THRESHOLD = 64
+# File sections iter_chunks encodes per batch, bounds the tokens held at once
+CHUNK_ENCODE_BATCH_SECTIONS = int(os.getenv("CHUNK_ENCODE_BATCH_SECTIONS", 256))
+# Root for the on-disk caches (LLM responses, artifacts, environments). Absolute,
+# the test runner changes the working directory into every cloned repository
+CACHE_DIR = os.path.abspath(os.getenv("AGENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")))
+FILE_DELIMITER_PATTERN = re.compile(r'\n={60,}\nFile: [^\n]+')
+FILE_HEADER_PATTERN = re.compile(r'\n={60,}\nFile: ([^\n]+)\n(?:={60,}\n)?')
+
+_tokenizer_pool = None
+_tokenizer_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model=DEFAULT_TOKENIZER_MODEL):
+    """
+    Resolve the tiktoken encoder for a model once per process.
+    """
+    try:
+        return encoding_for_model(model)
+    except KeyError:
+        # Unknown model names still need a tokenizer, cl100k is the closest family
+        print(f"No tiktoken mapping for model {model}, falling back to cl100k_base")
+        return get_encoding("cl100k_base")
+
+
+def get_tokenizer_pool():
+    """
+    Shared thread pool for batch tokenization. tiktoken releases the GIL while
+    encoding, so threads scale across cores.
+    """
+    global _tokenizer_pool
+    with _tokenizer_pool_lock:
+        if _tokenizer_pool is None:
+            _tokenizer_pool = ThreadPoolExecutor(max_workers=TOKENIZER_WORKERS, thread_name_prefix="tokenizer")
+        return _tokenizer_pool
+
+
 # Function to count tokens
-def count_tokens(text, model="gpt-3.5-turbo"):
-    enc = encoding_for_model(model)
-    return len(enc.encode(text))
-
-def split_large_chunk(chunk, max_chunk_tokens, model="gpt-3.5-turbo"):
-    """
-    Split a chunk into smaller parts if it exceeds the token limit.
-    """
-    enc = encoding_for_model(model)
-    encoded = enc.encode(chunk)
-    split_chunks = [
-        enc.decode(encoded[i:i + max_chunk_tokens])
-        for i in range(0, len(encoded), max_chunk_tokens)
-    ]
-    return split_chunks
-def split_into_chunks(text, max_size):
-        """
-        Split text into manageable chunks by logical delimiters and enforce token limits.
-        """
-        chunks = []
-        current_chunk = []
-        current_size = 0
-
-        sections = re.split(r'(\n={60,}\nFile: [^\n]+)', text)
-        for section in sections:
-            section_size = count_tokens(section)
-            if current_size + section_size > max_size:
-                if current_chunk:
-                    chunks.append("".join(current_chunk))
-                current_chunk = [section]
-                current_size = section_size
-            else:
-                current_chunk.append(section)
-                current_size += section_size
-
-        if current_chunk:
-            chunks.append("".join(current_chunk))
-
-        return chunks
+def count_tokens(text, model=DEFAULT_TOKENIZER_MODEL):
+    return len(get_encoder(model).encode_ordinary(text))
+
+
+def _map_texts(func, texts):
+    """
+    [func(text) for text in texts], large batches sliced across the shared
+    tokenizer pool. Results keep the input order.
+    """
+    texts = list(texts)
+    if len(texts) < BATCH_PARALLEL_THRESHOLD:
+        return [func(text) for text in texts]
+
+    slice_size = -(-len(texts) // (TOKENIZER_WORKERS * 4))
+    slices = [texts[i:i + slice_size] for i in range(0, len(texts), slice_size)]
+    results = []
+    for slice_results in get_tokenizer_pool().map(lambda batch: [func(text) for text in batch], slices):
+        results.extend(slice_results)
+    return results
+
+
+def encode_batch(texts, model=DEFAULT_TOKENIZER_MODEL):
+    """
+    Encode many texts in one call, returning their tokens in input order.
+    """
+    return _map_texts(get_encoder(model).encode_ordinary, texts)
+
+
+def count_tokens_batch(texts, model=DEFAULT_TOKENIZER_MODEL):
+    """
+    Count tokens for many texts in one call, returning the counts in input order.
+    """
+    enc = get_encoder(model)
+    return _map_texts(lambda text: len(enc.encode_ordinary(text)), texts)
+
+
+def iter_file_sections(text):
+    """
+    Lazily yield the gitingest content one file at a time, each section starting
+    with its "File:" delimiter.
+    """
+    start = 0
+    for match in FILE_DELIMITER_PATTERN.finditer(text):
+        if match.start() > start:
+            yield text[start:match.start()]
+        start = match.start()
+    if start < len(text):
+        yield text[start:]
+
+
+def iter_files(text):
+    """
+    Lazily yield (path, body) for every file of the gitingest content.
+    """
+    for section in iter_file_sections(text):
+        match = FILE_HEADER_PATTERN.match(section)
+        if match:
+            yield match.group(1).strip(), section[match.end():]
+
+
+def _iter_encoded_sections(text, model=DEFAULT_TOKENIZER_MODEL):
+    sections = iter_file_sections(text)
+    while True:
+        batch = list(islice(sections, CHUNK_ENCODE_BATCH_SECTIONS))
+        if not batch:
+            return
+        yield from encode_batch(batch, model)
+
+
+def iter_chunks(text, max_tokens, model=DEFAULT_TOKENIZER_MODEL):
+    """
+    Yield chunks of at most `max_tokens` tokens, cutting on the "File:" delimiters.
+
+    Every section is encoded exactly once, CHUNK_ENCODE_BATCH_SECTIONS at a time
+    with encode_batch. Sections are packed by token offset and only decoded when
+    a chunk is emitted, a section larger than the limit is cut at token
+    boundaries instead of being re-encoded.
+    """
+    enc = get_encoder(model)
+    buffer = []
+    for tokens in _iter_encoded_sections(text, model):
+        if len(buffer) + len(tokens) <= max_tokens:
+            buffer.extend(tokens)
+            continue
+
+        if buffer:
+            yield enc.decode(buffer)
+
+        offset = 0
+        while len(tokens) - offset > max_tokens:
+            yield enc.decode(tokens[offset:offset + max_tokens])
+            offset += max_tokens
+        buffer = tokens[offset:]
+
+    if buffer:
+        yield enc.decode(buffer)
+
+
+async def gather_chunks(chunks, analyze, max_concurrency, errors, label):
+    """
+    Await `analyze(index, chunk)` for every non-empty chunk, at most
+    `max_concurrency` at a time, and return {index: result} of the chunks that
+    succeeded. Failed chunks are appended to `errors` as dicts with the chunk
+    index, error type and message.
+    """
+    results = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(index, chunk):
+        try:
+            results[index] = await analyze(index, chunk)
+        except Exception as e:
+            print(f"Error during OpenAI API call {label} (chunk {index}): {str(e)}")
+            errors.append({
+                "chunk_index": index,
+                "error_type": type(e).__name__,
+                "error": str(e),
+            })
+        finally:
+            semaphore.release()
+
+    tasks = []
+    for index, chunk in enumerate(chunks):
+        if chunk.strip():  # Skip empty chunks
+            # Acquire before creating the task so only the in-flight chunks are held in memory
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run(index, chunk)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def format_file_sections(files):
+    """
+    Render {path: text} in the gitingest content format, so fetched files go
+    through the same agents as an ingested repository.
+    """
+    delimiter = "=" * 64
+    return "".join(f"\n{delimiter}\nFile: {path}\n{delimiter}\n{text}\n" for path, text in files.items())
+
+
+def split_into_chunks(text, max_size, model=DEFAULT_TOKENIZER_MODEL):
+    """
+    Split text into manageable chunks by logical delimiters and enforce token limits.
+    """
+    return list(iter_chunks(text, max_size, model))
     
 def get_repo_name(url):
     # Parse the URL
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from utils import CACHE_DIR
+from wheelhouse import DEPENDENCY_FILES, get_wheelhouse, project_install_args, python_version_tag
+
+VENV_CACHE_DIR = os.path.abspath(os.getenv("VENV_CACHE_DIR", os.path.join(CACHE_DIR, "venvs")))
+VENV_CACHE_MAX_BYTES = int(os.getenv("VENV_CACHE_MAX_BYTES", 10 * 1024 * 1024 * 1024))
+VENV_INSTALL_TIMEOUT = int(os.getenv("VENV_INSTALL_TIMEOUT", 1800))  # Seconds for creating one venv
+
+METADATA_FILE = "venv-cache.json"
+
+_venv_cache = None
+_venv_cache_lock = threading.Lock()
+
+
+def venv_python(venv_dir):
+    if os.name == "nt":
+        return os.path.join(venv_dir, "Scripts", "python.exe")
+    return os.path.join(venv_dir, "bin", "python")
+
+
+def dependency_key(project_dir=".", packages=(), python=sys.executable):
+    """
+    Hash of the project's dependency files, the extra packages and the Python
+    version. Projects with the same key can share one environment.
+    """
+    digest = hashlib.sha256(python_version_tag(python).encode("utf-8"))
+    for name in DEPENDENCY_FILES:
+        path = os.path.join(project_dir, name)
+        if os.path.exists(path):
+            with open(path, "rb") as dependency_file:
+                digest.update(f"\0{name}\0".encode("utf-8") + dependency_file.read())
+    digest.update(json.dumps(sorted(packages)).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _link_or_copy(source, destination):
+    # Hardlinks cost no space, they are not possible across filesystems
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def relocate_scripts(venv_dir, old_prefix):
+    """
+    Point the console scripts and activate scripts of a venv moved from
+    `old_prefix` at its new location. Files are rewritten as new files so
+    hardlinked originals are left alone.
+    """
+    scripts_dir = os.path.dirname(venv_python(venv_dir))
+    old = os.path.abspath(old_prefix).encode("utf-8")
+    new = os.path.abspath(venv_dir).encode("utf-8")
+    for name in os.listdir(scripts_dir):
+        path = os.path.join(scripts_dir, name)
+        if os.path.islink(path) or not os.path.isfile(path) or os.path.getsize(path) > 1024 * 1024:
+            continue
+        with open(path, "rb") as script:
+            content = script.read()
+        if old not in content:
+            continue
+        mode = os.stat(path).st_mode
+        os.unlink(path)
+        with open(path, "wb") as script:
+            script.write(content.replace(old, new))
+        os.chmod(path, mode)
+
+
+class VenvCache:
+    """
+    Disk cache of ready virtual environments keyed by dependency_key().
+
+    A miss builds the environment once from the wheelhouse, a hit
+    only clones the cached one into the project with hardlinks. Entries are
+    evicted least-recently-used once they exceed `max_bytes` on disk.
+    """
+
+    def __init__(self, path=VENV_CACHE_DIR, max_bytes=VENV_CACHE_MAX_BYTES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _read_metadata(self, key):
+        try:
+            with open(os.path.join(self.entry_path(key), METADATA_FILE), "r") as metadata_file:
+                return json.load(metadata_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_metadata(self, key, metadata):
+        path = os.path.join(self.entry_path(key), METADATA_FILE)
+        with open(f"{path}.tmp", "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(f"{path}.tmp", path)
+
+    def build(self, key, project_dir=".", packages=(), python=sys.executable):
+        """
+        Create the environment of `key` with the project's requirements and
+        `packages` installed.
+        """
+        started = time.time()
+        building_path = f"{self.entry_path(key)}.building-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(building_path, ignore_errors=True)
+        try:
+            subprocess.run([python, "-m", "venv", building_path], check=True, timeout=VENV_INSTALL_TIMEOUT)
+            # Installs only read local wheels, built once per requirement set
+            get_wheelhouse().install(project_install_args(project_dir, packages), venv_python(building_path))
+        except Exception:
+            shutil.rmtree(building_path, ignore_errors=True)
+            raise
+
+        # Another process may have built the same key meanwhile, either copy will do
+        try:
+            os.rename(building_path, self.entry_path(key))
+        except OSError:
+            shutil.rmtree(building_path, ignore_errors=True)
+            return
+        relocate_scripts(self.entry_path(key), building_path)
+        now = time.time()
+        self._write_metadata(key, {
+            "size": _directory_size(self.entry_path(key)),
+            "packages": list(packages),
+            "created_at": now,
+            "last_used": now,
+        })
+        self.counters["builds"] += 1
+        print(f"Built virtual environment {key} in {now - started:.1f}s")
+
+    def get(self, project_dir=".", packages=(), python=sys.executable):
+        """
+        Path of the cached environment for the project, built on a miss, and
+        whether it was a hit.
+        """
+        key = dependency_key(project_dir, packages, python)
+        with self._key_lock(key):
+            metadata = self._read_metadata(key)
+            hit = metadata is not None
+            if not hit:
+                self.counters["misses"] += 1
+                shutil.rmtree(self.entry_path(key), ignore_errors=True)
+                self.build(key, project_dir, packages, python)
+                metadata = self._read_metadata(key) or {"size": _directory_size(self.entry_path(key))}
+            else:
+                self.counters["hits"] += 1
+            metadata["last_used"] = time.time()
+            self._write_metadata(key, metadata)
+        self.evict(keep=key)
+        return self.entry_path(key), hit
+
+    def checkout(self, destination, project_dir=".", packages=(), python=sys.executable):
+        """
+        Clone the cached environment of the project to `destination` and
+        return the path of its interpreter and whether the cache had it. The
+        clone can be changed freely, files pip rewrites are replaced rather
+        than edited in place.
+        """
+        source, hit = self.get(project_dir, packages, python)
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination, symlinks=True, copy_function=_link_or_copy, ignore=shutil.ignore_patterns(METADATA_FILE))
+        relocate_scripts(destination, source)
+        return venv_python(destination), hit
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used environments until the cache fits in
+        `max_bytes`. `keep` is never removed.
+        """
+        with self.lock:
+            entries = []
+            for key in os.listdir(self.path):
+                metadata = self._read_metadata(key)
+                if metadata is not None:
+                    entries.append((metadata.get("last_used", 0), metadata.get("size", 0), key))
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                shutil.rmtree(self.entry_path(key), ignore_errors=True)
+                total -= size
+                self.counters["evictions"] += 1
+            return total
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "hit_rate": self.counters["hits"] / lookups if lookups else 0.0}
+
+
+def get_venv_cache():
+    global _venv_cache
+    with _venv_cache_lock:
+        if _venv_cache is None:
+            _venv_cache = VenvCache()
+        return _venv_cache
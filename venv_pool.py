@@ -0,0 +1,216 @@
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from utils import CACHE_DIR
+from venv_cache import DEPENDENCY_FILES, dependency_key, get_venv_cache, relocate_scripts, venv_python
+
+VENV_POOL_DIR = os.path.abspath(os.getenv("VENV_POOL_DIR", os.path.join(CACHE_DIR, "venv-pool")))
+VENV_POOL_SIZE = int(os.getenv("VENV_POOL_SIZE", 2))  # Ready environments kept per requirement set
+VENV_POOL_MAX_SETS = int(os.getenv("VENV_POOL_MAX_SETS", 8))  # Recently seen requirement sets kept warm
+INPUTS_DIR = "inputs"
+READY_DIR = "ready"
+SET_FILE = "set.json"
+
+_venv_pool = None
+_venv_pool_lock = threading.Lock()
+
+
+class VenvPool:
+    """
+    Keeps `size` ready-to-use clones of the cached environment of each of the
+    `max_sets` most recently seen requirement sets.
+
+    checkout() moves a ready clone into the project, a rename that takes
+    milliseconds, and falls back to the venv cache when none is ready. Either
+    way a background thread then refills the pool for that set. Each set keeps
+    a copy of its dependency files so it can be refilled after the project
+    checkout is gone, and after a restart.
+    """
+
+    def __init__(self, path=VENV_POOL_DIR, size=VENV_POOL_SIZE, max_sets=VENV_POOL_MAX_SETS, cache=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.size = size
+        self.max_sets = max_sets
+        self.cache = cache or get_venv_cache()
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.sets = {}
+        self.queue = queue.Queue()
+        self.queued = set()
+        for key in os.listdir(path):
+            self._load_set(key)
+        self.thread = threading.Thread(target=self._worker, name="venv-pool-refill", daemon=True)
+        self.thread.start()
+        # Top up the sets kept from before a restart
+        self.refill()
+
+    def set_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _load_set(self, key):
+        try:
+            with open(os.path.join(self.set_path(key), SET_FILE), "r") as set_file:
+                entry = json.load(set_file)
+        except (OSError, ValueError):
+            shutil.rmtree(self.set_path(key), ignore_errors=True)
+            return
+        # Clones interrupted half-way never made it into ready/
+        for name in os.listdir(self.set_path(key)):
+            if name.startswith("building-"):
+                shutil.rmtree(os.path.join(self.set_path(key), name), ignore_errors=True)
+        ready_dir = os.path.join(self.set_path(key), READY_DIR)
+        os.makedirs(ready_dir, exist_ok=True)
+        entry["ready"] = [os.path.join(ready_dir, name) for name in os.listdir(ready_dir)]
+        self.sets[key] = entry
+
+    def _save_set(self, key, entry):
+        with open(os.path.join(self.set_path(key), SET_FILE), "w") as set_file:
+            json.dump({name: value for name, value in entry.items() if name != "ready"}, set_file)
+
+    def _register(self, key, project_dir, packages, python):
+        """
+        Record the requirement set as recently seen and drop the least
+        recently seen ones beyond `max_sets`. Called with the lock held.
+        """
+        entry = self.sets.get(key)
+        if entry is None:
+            inputs_dir = os.path.join(self.set_path(key), INPUTS_DIR)
+            os.makedirs(inputs_dir, exist_ok=True)
+            os.makedirs(os.path.join(self.set_path(key), READY_DIR), exist_ok=True)
+            for name in DEPENDENCY_FILES:
+                if os.path.exists(os.path.join(project_dir, name)):
+                    shutil.copy2(os.path.join(project_dir, name), os.path.join(inputs_dir, name))
+            entry = self.sets[key] = {"packages": list(packages), "python": python, "ready": []}
+        entry["last_seen"] = time.time()
+        self._save_set(key, entry)
+
+        for stale_key in sorted(self.sets, key=lambda name: self.sets[name]["last_seen"])[:-self.max_sets]:
+            if stale_key not in self.queued:
+                del self.sets[stale_key]
+                shutil.rmtree(self.set_path(stale_key), ignore_errors=True)
+                self.counters["dropped_sets"] += 1
+
+    def checkout(self, destination, project_dir=".", packages=(), python=sys.executable):
+        """
+        Put an environment for the project at `destination` and return the
+        path of its interpreter and where the environment came from: "pool",
+        "cache" or "build".
+        """
+        key = dependency_key(project_dir, packages, python)
+        with self.lock:
+            self._register(key, project_dir, packages, python)
+            ready = self.sets[key]["ready"]
+            clone = ready.pop() if ready else None
+            self.counters["hits" if clone else "misses"] += 1
+
+        if clone:
+            shutil.rmtree(destination, ignore_errors=True)
+            # A rename within one filesystem, a copy otherwise
+            shutil.move(clone, destination)
+            relocate_scripts(destination, clone)
+            python_path, source = venv_python(destination), "pool"
+        else:
+            python_path, hit = self.cache.checkout(destination, project_dir, packages, python)
+            source = "cache" if hit else "build"
+        self.refill(key)
+        return python_path, source
+
+    def prewarm(self, project_dir=".", packages=(), python=sys.executable):
+        """
+        Start filling the pool for a project ahead of its first checkout.
+        """
+        key = dependency_key(project_dir, packages, python)
+        with self.lock:
+            self._register(key, project_dir, packages, python)
+        self.refill(key)
+
+    def refill(self, key=None):
+        """
+        Queue a refill of one requirement set, or of every known set.
+        """
+        with self.lock:
+            keys = [key] if key is not None else list(self.sets)
+            for key in keys:
+                if key in self.sets and key not in self.queued:
+                    self.queued.add(key)
+                    self.queue.put(key)
+
+    def _fill(self, key):
+        with self.lock:
+            entry = self.sets.get(key)
+            missing = self.size - len(entry["ready"]) if entry else 0
+        for _ in range(missing):
+            inputs_dir = os.path.join(self.set_path(key), INPUTS_DIR)
+            building_path = os.path.join(self.set_path(key), f"building-{uuid.uuid4().hex}")
+            clone = os.path.join(self.set_path(key), READY_DIR, uuid.uuid4().hex)
+            try:
+                self.cache.checkout(building_path, inputs_dir, entry["packages"], entry["python"])
+                os.rename(building_path, clone)
+                relocate_scripts(clone, building_path)
+            except Exception:
+                shutil.rmtree(building_path, ignore_errors=True)
+                raise
+            with self.lock:
+                if self.sets.get(key) is not entry:
+                    # The set was dropped while the clone was made
+                    shutil.rmtree(clone, ignore_errors=True)
+                    return
+                entry["ready"].append(clone)
+                self.counters["clones"] += 1
+            print(f"Pre-warmed a virtual environment for requirement set {key}")
+
+    def _worker(self):
+        while True:
+            key = self.queue.get()
+            try:
+                self._fill(key)
+            except Exception as e:
+                self.counters["refill_failures"] += 1
+                print(f"Failed to refill virtual environment pool {key}: {e}")
+            finally:
+                with self.lock:
+                    self.queued.discard(key)
+                self.queue.task_done()
+
+    def stats(self):
+        with self.lock:
+            checkouts = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": self.counters["hits"] / checkouts if checkouts else 0.0,
+                "ready": {key: len(entry["ready"]) for key, entry in self.sets.items()},
+                "ready_total": sum(len(entry["ready"]) for entry in self.sets.values()),
+                "pending_refills": len(self.queued),
+                "cache": self.cache.stats(),
+            }
+
+
+def known_requirement_sets(path=VENV_POOL_DIR):
+    """
+    (dependency files directory, packages, python) of every requirement set
+    the pool keeps warm, read from disk without starting a pool.
+    """
+    sets = []
+    for key in os.listdir(path) if os.path.isdir(path) else []:
+        try:
+            with open(os.path.join(path, key, SET_FILE), "r") as set_file:
+                entry = json.load(set_file)
+        except (OSError, ValueError):
+            continue
+        sets.append((os.path.join(path, key, INPUTS_DIR), entry["packages"], entry["python"]))
+    return sets
+
+
+def get_venv_pool():
+    global _venv_pool
+    with _venv_pool_lock:
+        if _venv_pool is None:
+            _venv_pool = VenvPool()
+        return _venv_pool
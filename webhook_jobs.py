@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+# run_test() chdirs into the checkout it tests and the working directory is
+# process-wide, so jobs must not run concurrently until it no longer depends on it
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 1))
+MAX_RETAINED_JOBS = int(os.getenv("WEBHOOK_MAX_RETAINED_JOBS", 1000))  # Finished jobs kept for status lookups
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that noticed its job was superseded."""
+
+
+def check_cancelled(cancel_event):
+    """
+    Stage checkpoint for handlers, raises JobCancelled once `cancel_event` is set.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled("Job was superseded by a newer delivery")
+
+
+class WebhookJobQueue:
+    """
+    Background worker pool for webhook deliveries.
+
+    `submit` returns immediately, the deliveries are handled by `workers`
+    threads. Jobs are tracked by delivery ID so redeliveries of a job that is
+    queued, running or done are not processed twice.
+    """
+
+    def __init__(self, handler, workers=WEBHOOK_WORKERS):
+        self.handler = handler
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.accepting = True
+        self.threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"webhook-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, delivery_id, payload, event_type, handler=None):
+        """
+        Queue a delivery and return its job record. `handler` overrides the
+        queue's handler for this job.
+        """
+        with self.lock:
+            if not self.accepting:
+                raise RuntimeError("Webhook job queue is shutting down")
+            existing = self.jobs.get(delivery_id)
+            if existing and existing["status"] != "failed":
+                print(f"Delivery {delivery_id} already {existing['status']}, skipping redelivery")
+                return dict(existing)
+
+            job = {
+                "delivery_id": delivery_id,
+                "event_type": event_type,
+                "status": "queued",
+                "error": None,
+                "queued_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self.jobs[delivery_id] = job
+            self.jobs.move_to_end(delivery_id)
+            self._trim()
+        self.queue.put((job, payload, handler or self.handler))
+        return dict(job)
+
+    def record(self, delivery_id, event_type, status, **fields):
+        """
+        Track a delivery that is not run as its own job, e.g. one merged into another.
+        """
+        with self.lock:
+            self.jobs[delivery_id] = {
+                "delivery_id": delivery_id,
+                "event_type": event_type,
+                "status": status,
+                "error": None,
+                "queued_at": time.time(),
+                "started_at": None,
+                "finished_at": time.time(),
+                **fields,
+            }
+            self.jobs.move_to_end(delivery_id)
+            self._trim()
+
+    def status(self, delivery_id):
+        with self.lock:
+            job = self.jobs.get(delivery_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": len(self.threads), "pending": self.queue.qsize(), "jobs": counts}
+
+    def _trim(self):
+        finished = [key for key, job in self.jobs.items() if job["status"] in ("succeeded", "failed", "cancelled", "coalesced")]
+        for key in finished[:max(0, len(self.jobs) - MAX_RETAINED_JOBS)]:
+            del self.jobs[key]
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                job, payload, handler = item
+                with self.lock:
+                    if job["status"] == "cancelled":
+                        continue
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+
+                try:
+                    handler(payload, job["event_type"])
+                    status, error = "succeeded", None
+                except JobCancelled as e:
+                    print(f"Webhook job {job['delivery_id']} cancelled: {e}")
+                    status, error = "cancelled", None
+                except (Exception, SystemExit) as e:
+                    # SystemExit included, a sys.exit() deep in a handler must not kill the worker
+                    print(f"Webhook job {job['delivery_id']} failed: {e!r}")
+                    traceback.print_exc()
+                    status, error = "failed", repr(e) if isinstance(e, SystemExit) else str(e)
+
+                with self.lock:
+                    job["status"] = status
+                    job["error"] = error
+                    job["finished_at"] = time.time()
+            finally:
+                self.queue.task_done()
+
+    def shutdown(self, drain=True, timeout=None):
+        """
+        Stop accepting jobs and stop the workers. With `drain`, queued and
+        in-flight jobs finish first, otherwise queued jobs are cancelled.
+        """
+        with self.lock:
+            if not self.accepting:
+                return
+            self.accepting = False
+        if not drain:
+            while True:
+                try:
+                    job, _, _ = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                with self.lock:
+                    job["status"] = "cancelled"
+                    job["finished_at"] = time.time()
+                self.queue.task_done()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        print("Webhook job queue stopped")
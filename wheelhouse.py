@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from utils import CACHE_DIR
+
+WHEELHOUSE_DIR = os.path.abspath(os.getenv("WHEELHOUSE_DIR", os.path.join(CACHE_DIR, "wheelhouse")))
+# Install from the wheelhouse only and never reach the package index
+WHEELHOUSE_OFFLINE = os.getenv("WHEELHOUSE_OFFLINE", "0") != "0"
+PIP_TIMEOUT = int(os.getenv("PIP_TIMEOUT", 1800))  # Seconds for one pip command
+
+# Requirement files installed into a project's venv, they are also its cache
+# key. Lockfiles pip cannot install (poetry.lock, Pipfile.lock) stay out of both
+DEPENDENCY_FILES = ("requirements.txt",)
+WHEELS_DIR = "wheels"
+SETS_DIR = "sets"
+
+_wheelhouse = None
+_wheelhouse_lock = threading.Lock()
+
+
+def python_version_tag(python=sys.executable):
+    if python == sys.executable:
+        return f"{sys.implementation.name}-{platform.python_version()}-{platform.machine()}"
+    command = [python, "-c", "import platform, sys; print(f'{sys.implementation.name}-{platform.python_version()}-{platform.machine()}')"]
+    return subprocess.run(command, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def requirements_key(install_args, python=sys.executable):
+    """
+    Hash of pip install arguments and the Python version wheels are built
+    for. Files passed with -r count by their contents, not their path, so
+    every checkout of a project shares one requirement set.
+    """
+    digest = hashlib.sha256(python_version_tag(python).encode("utf-8"))
+    args = list(install_args)
+    for index, arg in enumerate(args):
+        if index > 0 and args[index - 1] in ("-r", "--requirement") and os.path.exists(arg):
+            with open(arg, "rb") as requirements_file:
+                digest.update(b"\0" + requirements_file.read())
+        else:
+            digest.update(f"\0{arg}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class Wheelhouse:
+    """
+    Local directory of wheels that pip installs from with
+    `--no-index --find-links`.
+
+    Wheels for a requirement set are built once with `pip wheel`, every later
+    install of the set only reads local files. In offline mode nothing is
+    downloaded and an install of a set that was never prefetched fails.
+    """
+
+    def __init__(self, path=WHEELHOUSE_DIR, offline=WHEELHOUSE_OFFLINE):
+        self.path = path
+        self.wheels_dir = os.path.join(path, WHEELS_DIR)
+        self.sets_dir = os.path.join(path, SETS_DIR)
+        os.makedirs(self.wheels_dir, exist_ok=True)
+        os.makedirs(self.sets_dir, exist_ok=True)
+        self.offline = offline
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _set_path(self, key):
+        return os.path.join(self.sets_dir, f"{key}.json")
+
+    def has_wheels(self, key):
+        return os.path.exists(self._set_path(key))
+
+    def _run_pip(self, python, args):
+        command = [python, "-m", "pip"] + args[:1] + ["--disable-pip-version-check"] + args[1:]
+        result = subprocess.run(command, capture_output=True, text=True, timeout=PIP_TIMEOUT)
+        if result.returncode != 0:
+            raise Exception(f"pip {args[0]} failed: {result.stdout[-2000:]}{result.stderr[-2000:]}")
+        return result
+
+    def build(self, install_args, python=sys.executable):
+        """
+        Build or download wheels for every requirement in `install_args`,
+        dependencies included. Wheels already in the wheelhouse are reused.
+        """
+        install_args = list(install_args)
+        if not install_args:
+            return None
+        key = requirements_key(install_args, python)
+        with self._key_lock(key):
+            if self.has_wheels(key):
+                return key
+            if self.offline:
+                raise Exception(f"No wheels for requirement set {key} in {self.wheels_dir}, prefetch them before installing offline")
+            started = time.time()
+            before = set(os.listdir(self.wheels_dir))
+            self._run_pip(python, ["wheel", "--wheel-dir", self.wheels_dir, "--find-links", self.wheels_dir] + list(install_args))
+            with open(self._set_path(key), "w") as set_file:
+                json.dump({"install_args": list(install_args), "built_at": time.time()}, set_file)
+            self.counters["builds"] += 1
+            added = len(set(os.listdir(self.wheels_dir)) - before)
+            print(f"Built {added} new wheel(s) for requirement set {key} in {time.time() - started:.1f}s")
+            return key
+
+    def install(self, install_args, python=sys.executable):
+        """
+        `pip install install_args` into the environment of `python` from the
+        wheelhouse only, building the wheels first when they are missing.
+        """
+        install_args = list(install_args)
+        if not install_args:
+            return
+        key = self.build(install_args, python)
+        try:
+            self._run_pip(python, ["install", "--no-index", "--find-links", self.wheels_dir] + install_args)
+        except Exception:
+            if self.offline:
+                raise
+            # Wheels of the set were deleted since it was built, build them again
+            self.counters["rebuilds"] += 1
+            os.remove(self._set_path(key))
+            self.build(install_args, python)
+            self._run_pip(python, ["install", "--no-index", "--find-links", self.wheels_dir] + install_args)
+        self.counters["installs"] += 1
+
+    def stats(self):
+        return {
+            **self.counters,
+            "offline": self.offline,
+            "wheels": len(os.listdir(self.wheels_dir)),
+            "requirement_sets": len(os.listdir(self.sets_dir)),
+        }
+
+
+def get_wheelhouse():
+    global _wheelhouse
+    with _wheelhouse_lock:
+        if _wheelhouse is None:
+            _wheelhouse = Wheelhouse()
+        return _wheelhouse
+
+
+def project_install_args(project_dir, packages=()):
+    install_args = list(packages)
+    for name in DEPENDENCY_FILES:
+        requirements = os.path.join(project_dir, name)
+        if os.path.exists(requirements):
+            install_args += ["-r", os.path.abspath(requirements)]
+    return install_args
+
+
+def main():
+    parser = argparse.ArgumentParser(description=(
+        "Prefetch wheels into the wheelhouse so the projects can later be installed offline. "
+        "Without projects, prefetches every requirement set kept warm by the venv pool."
+    ))
+    parser.add_argument("projects", nargs="*", help="Project directories containing a requirements.txt")
+    parser.add_argument("--package", action="append", default=[], help="Extra package to install with every project, e.g. pytest")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter the wheels are built for")
+    args = parser.parse_args()
+
+    targets = [(project, args.package, args.python) for project in args.projects]
+    if not targets:
+        from venv_pool import known_requirement_sets
+        targets = known_requirement_sets()
+
+    wheelhouse = Wheelhouse(offline=False)
+    failed = 0
+    for project, packages, python in targets:
+        install_args = project_install_args(project, packages)
+        if not install_args:
+            print(f"{project}: nothing to install")
+            continue
+        try:
+            key = wheelhouse.build(install_args, python)
+            print(f"{project}: requirement set {key} ready")
+        except Exception as e:
+            failed += 1
+            print(f"{project}: {e}")
+    print(json.dumps(wheelhouse.stats()))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()